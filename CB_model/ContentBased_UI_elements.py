@@ -118,14 +118,14 @@ def rating_buttons_frame(root, games_frame, ratings_frame, user_ratings_dict, di
     return rating_frame
 
 
-def recommendations_frame(root, user_ratings_dict, dir_path, df_games, recommender=None):
+def recommendations_frame(root, user_ratings_dict, dir_path, catalog):
     """Recommendations frame - Đã thêm nút Clear Data"""
     recommendations_frame = tk.Frame(root)
     recommendations_frame.pack(pady=10)
 
     # 1. Save Ratings
     save_button = tk.Button(recommendations_frame, text='Save Ratings', 
-                           command=lambda: cb_commands.save_ratings(user_ratings_dict, df_games, dir_path), 
+                           command=lambda: cb_commands.save_ratings(user_ratings_dict, catalog, dir_path), 
                            font=('Arial', 12), bg='lightblue')
     save_button.grid(row=0, column=0, padx=10, pady=10)
 
@@ -137,7 +137,7 @@ def recommendations_frame(root, user_ratings_dict, dir_path, df_games, recommend
 
     # 3. Get Recommendations
     recommend_button = tk.Button(recommendations_frame, text='Get Recommendations', 
-                                command=lambda: cb_commands.get_recommendations(dir_path, root=root, preloaded_recommender=recommender), 
+                                command=lambda: cb_commands.get_recommendations(dir_path, root=root), 
                                 font=('Arial', 12), bg='lightyellow')
     recommend_button.grid(row=0, column=2, padx=10, pady=10)
 
@@ -0,0 +1,82 @@
+"""
+ANN Index (IVF) cho embedding Content-Based
+Chia game thành n_lists cụm bằng k-means trên vector đã chuẩn hóa L2 (khoảng cách Euclid
+trên mặt cầu đơn vị ~ cosine). Khi query chỉ xét các game trong n_probe cụm có tâm gần nhất,
+sau đó model chấm lại chính xác (float32) trên shortlist này thay vì toàn bộ catalog.
+
+Lưu cùng thư mục model: ann_centroids.npy (float32), ann_labels.npy (cụm của từng dòng, int32).
+Danh sách game của từng cụm (inverted lists) dựng lại từ labels khi load.
+"""
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+KMEANS_BATCH = 4096
+KMEANS_SAMPLE_PER_LIST = 64     # k-means chỉ học trên tối đa 64 game / cụm (mẫu ngẫu nhiên), sau đó gán toàn bộ
+ASSIGN_BLOCK = 65536
+
+
+def default_n_lists(n_games):
+    """~4 * sqrt(N) cụm (vd. 1M game -> 4000 cụm ~250 game / cụm)"""
+    return max(1, min(n_games, int(4 * np.sqrt(n_games))))
+
+
+class IVFIndex:
+    def __init__(self, centroids, labels, n_probe=None):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.n_probe = n_probe or max(1, len(self.centroids) // 50)   # mặc định xét ~2% số cụm
+        self._lists = None
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, features, n_lists=None, n_probe=None, random_state=42):
+        """features: ma trận đã chuẩn hóa L2 (dòng = game); n_lists > số game -> giảm còn số game"""
+        n_lists = max(1, min(n_lists or default_n_lists(len(features)), len(features)))
+        rng = np.random.default_rng(random_state)
+        sample_size = min(len(features), KMEANS_SAMPLE_PER_LIST * n_lists)
+        sample = np.sort(rng.choice(len(features), sample_size, replace=False)) if sample_size < len(features) else slice(None)
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=KMEANS_BATCH, n_init=1, random_state=random_state)
+        kmeans.fit(features[sample])
+        centroids = kmeans.cluster_centers_
+        norms = np.linalg.norm(centroids, axis=1)
+        centroids = centroids / np.where(norms > 0, norms, 1.0)[:, None]
+        index = cls(centroids, np.zeros(len(features), dtype=np.int32), n_probe)
+        index.labels = index.assign(features)
+        return index
+
+    def assign(self, features):
+        """Cụm gần nhất (tích vô hướng lớn nhất với tâm) của từng dòng"""
+        labels = np.empty(len(features), dtype=np.int32)
+        for start in range(0, len(features), ASSIGN_BLOCK):
+            block = np.asarray(features[start:start + ASSIGN_BLOCK], dtype=np.float32)
+            labels[start:start + ASSIGN_BLOCK] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def update(self, rows, features, n_rows):
+        """Gán lại cụm cho các dòng đã thay / thêm (fold-in); n_rows: tổng số dòng mới của model"""
+        labels = np.zeros(n_rows, dtype=np.int32)
+        labels[:len(self.labels)] = self.labels
+        labels[rows] = self.assign(features)
+        self.labels = labels
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.labels, kind='stable').astype(np.int32)
+            offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.labels, minlength=self.n_lists), out=offsets[1:])
+            self._lists = (order, offsets)
+        return self._lists
+
+    def search(self, query, n_probe=None):
+        """Các dòng (tăng dần) thuộc n_probe cụm có tâm giống query nhất"""
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        order, offsets = self._inverted_lists()
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe] if n_probe < self.n_lists else np.arange(self.n_lists)
+        rows = np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes])
+        return np.sort(rows)
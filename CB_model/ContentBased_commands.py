@@ -6,12 +6,111 @@ from tkinter import messagebox
 import re
 import pandas as pd
 import os
+import atexit
+import queue
 import threading
-from ContentBased_model import ContentBasedRecommender
+from ContentBased_model import ContentBasedRecommender, MODEL_DIR_NAME, find_model_path, remove_model
 # Import hàm load chuẩn từ Data Handler
-from ContentBased_data_handler import save_ratings_data, load_ratings_data, load_games_csv
+from ContentBased_data_handler import save_ratings_data, load_ratings_data, load_games_csv, load_games_catalog
 
-MODEL_JUST_TRAINED = False
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+class CBSession:
+    """
+    Trạng thái sống suốt phiên UI cho 1 thư mục CB_model: catalog, model và ratings giữ trong RAM.
+    Mỗi phần chỉ load lại khi file nguồn đổi mtime, hoặc khi retrain / xóa model (set_model / invalidate_model).
+    File cb_recommendations.csv được ghi bởi 1 thread nền, không chặn việc hiển thị kết quả;
+    khi thoát chương trình (atexit) luôn chờ ghi xong các file còn trong hàng đợi.
+    """
+
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+        self.games_path = os.path.join(dir_path, "CB_games.csv")
+        self.ratings_path = os.path.join(os.path.dirname(dir_path), "user_data", "cb_user_ratings.json")
+        self._lock = threading.Lock()
+        self._model = (None, None)      # (chữ ký file model, recommender)
+        self._ratings = (None, {})      # (mtime file ratings, {AppID: rating})
+        self._exports = queue.Queue()
+        threading.Thread(target=self._export_worker, daemon=True).start()
+        # Thread ghi là daemon (bị dừng khi thoát) -> flush trước, không mất file đang chờ ghi
+        atexit.register(self.flush)
+
+    def catalog(self):
+        """Catalog game (load_games_catalog đã cache theo mtime của CB_games.csv)"""
+        return load_games_catalog(self.games_path)
+
+    def _model_signature(self):
+        path = find_model_path(self.dir_path)
+        if path is None: return None
+        marker = os.path.join(path, "manifest.json") if os.path.isdir(path) else path
+        return (path, _mtime(marker))
+
+    def model(self):
+        """Recommender đã load (None nếu chưa train); chỉ load lại khi model trên đĩa thay đổi"""
+        with self._lock:
+            signature = self._model_signature()
+            if signature is None:
+                self._model = (None, None)
+            elif self._model[0] != signature:
+                catalog = self.catalog()
+                recommender = ContentBasedRecommender()
+                if not recommender.load_model(signature[0], catalog.frame if catalog is not None else None):
+                    return None
+                self._model = (signature, recommender)
+            return self._model[1]
+
+    def set_model(self, recommender):
+        """Vừa train xong (đã save): dùng luôn bản trong RAM, không load lại từ đĩa"""
+        with self._lock:
+            self._model = (self._model_signature(), recommender)
+
+    def invalidate_model(self):
+        with self._lock:
+            self._model = (None, None)
+
+    def rated_games(self):
+        """{AppID: rating} từ cb_user_ratings.json, chỉ đọc lại khi file đổi mtime"""
+        with self._lock:
+            mtime = _mtime(self.ratings_path)
+            if mtime != self._ratings[0]:
+                ratings_data = load_ratings_data(self.ratings_path)
+                self._ratings = (mtime, {item['AppID']: item['user_rating'] for item in ratings_data if 'AppID' in item})
+            return dict(self._ratings[1])
+
+    def export(self, recs, file_name="cb_recommendations.csv"):
+        """Ghi kết quả ra CSV ở thread nền"""
+        self._exports.put((recs, os.path.join(self.dir_path, file_name)))
+
+    def _export_worker(self):
+        while True:
+            recs, path = self._exports.get()
+            try:
+                # Ghi file tạm rồi đổi tên: Hybrid không bao giờ đọc phải file ghi dở
+                recs.to_csv(path + ".tmp", index=False)
+                os.replace(path + ".tmp", path)
+            except Exception as e:
+                print(f"Could not write {path}: {e}")
+            finally:
+                self._exports.task_done()
+
+    def flush(self):
+        """Chờ các lần ghi CSV đang xếp hàng"""
+        self._exports.join()
+
+
+def get_session(dir_path):
+    """1 CBSession cho mỗi thư mục CB_model (dùng chung giữa các nút bấm)"""
+    key = os.path.abspath(dir_path)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = CBSession(dir_path)
+        return _sessions[key]
 
 def update_search(search_frame, games_dict, list_frame):
     games_listbox = None
@@ -55,18 +154,16 @@ def remove_rating(ratings_listbox, user_ratings_dict):
         for k, v in list(user_ratings_dict.items()):
             if v == item: del user_ratings_dict[k]
 
-def save_ratings(user_ratings_dict, df_games, dir_path):
+def save_ratings(user_ratings_dict, catalog, dir_path):
     try:
         ratings_data = []
         for name, info in user_ratings_dict.items():
             match = re.search(r'Rating:\s*(\d+)', info)
             if match:
                 rating = int(match.group(1))
-                # Tìm ID dựa trên cột Name (vì đã rename chuẩn)
-                rows = df_games[df_games['Name'] == name]
-                if not rows.empty:
-                    # Index chính là AppID
-                    app_id = rows.index[0]
+                # Tìm ID dựa trên tên game (hash map Name -> AppID của catalog)
+                app_id = catalog.app_id_of_title(name) if catalog is not None else None
+                if app_id is not None:
                     ratings_data.append({'AppID': int(app_id), 'Name': name, 'user_rating': rating})
         
         user_dir = os.path.join(os.path.dirname(dir_path), "user_data")
@@ -88,19 +185,17 @@ def clear_system_data(dir_path, root=None):
     # (Giữ nguyên code cũ - Hàm xóa model)
     if messagebox.askyesno("Confirm", "Delete trained model and cache?"):
         try:
-            for f in ["cb_model.pkl", "cb_recommendations.csv"]:
-                p = os.path.join(dir_path, f)
-                if os.path.exists(p): os.remove(p)
+            remove_model(dir_path)
+            p = os.path.join(dir_path, "cb_recommendations.csv")
+            if os.path.exists(p): os.remove(p)
             
-            global MODEL_JUST_TRAINED
-            MODEL_JUST_TRAINED = True
+            get_session(dir_path).invalidate_model()
             messagebox.showinfo("Success", "System data cleared. Please Train Model again.")
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
 def train_model(dir_path, root=None):
     def _train():
-        global MODEL_JUST_TRAINED
         try:
             # Dùng hàm load chuẩn để lấy dữ liệu sạch
             df = load_games_csv(os.path.join(dir_path, "CB_games.csv"))
@@ -108,58 +203,51 @@ def train_model(dir_path, root=None):
             
             recommender = ContentBasedRecommender()
             if recommender.train(df):
-                recommender.save_model(os.path.join(dir_path, "cb_model.pkl"))
-                MODEL_JUST_TRAINED = True
+                # Bảng "more like this": profile 1-3 game không phải chấm lại toàn bộ catalog
+                recommender.build_neighbour_table()
+                recommender.save_model(os.path.join(dir_path, MODEL_DIR_NAME))
+                get_session(dir_path).set_model(recommender)
                 if root: root.after(0, lambda: messagebox.showinfo('Success', 'Model trained!'))
         except Exception as e:
             if root: root.after(0, lambda: messagebox.showerror('Error', str(e)))
     
     threading.Thread(target=_train, daemon=True).start()
 
-def get_recommendations(dir_path, root=None, preloaded_recommender=None):
+def get_recommendations(dir_path, root=None):
     def _recommend():
-        global MODEL_JUST_TRAINED
         try:
-            model_path = os.path.join(dir_path, "cb_model.pkl")
-            if not os.path.exists(model_path):
+            # Catalog, model, ratings: lấy từ session (chỉ load lại khi file thay đổi)
+            session = get_session(dir_path)
+            catalog = session.catalog()
+            if catalog is None: return
+
+            recommender = session.model()
+            if recommender is None:
                 if root: root.after(0, lambda: messagebox.showerror('Error', 'Please train model first!'))
                 return
 
-            # Load Data & Model
-            df = load_games_csv(os.path.join(dir_path, "CB_games.csv"))
-            
-            recommender = None
-            # Logic reload thông minh
-            if MODEL_JUST_TRAINED or not preloaded_recommender:
-                recommender = ContentBasedRecommender()
-                recommender.load_model(model_path)
-                if MODEL_JUST_TRAINED: MODEL_JUST_TRAINED = False
-            else:
-                recommender = preloaded_recommender
-
-            # Load Ratings
-            ratings_path = os.path.join(os.path.dirname(dir_path), "user_data", "cb_user_ratings.json")
-            ratings_data = load_ratings_data(ratings_path)
-            rated_games = {item['AppID']: item['user_rating'] for item in ratings_data if 'AppID' in item}
+            if recommender.is_stale:
+                if root: root.after(0, lambda: messagebox.showwarning('Warning', 'CB_games.csv changed since the model was trained. Please retrain for up-to-date results.'))
 
+            rated_games = session.rated_games()
             if not rated_games:
                 if root: root.after(0, lambda: messagebox.showwarning('Warning', 'Please rate some games!'))
                 return
 
             # Get Recs
             prefs = {'max_price': 100}
-            recs = recommender.get_recommendations(df, rated_games, prefs, top_n=200)
+            recs = recommender.get_recommendations(catalog, rated_games, prefs, top_n=200)
             
             if recs.empty:
                 if root: root.after(0, lambda: messagebox.showwarning('Info', 'No recommendations found.'))
                 return
 
-            # Save & Show
-            recs.to_csv(os.path.join(dir_path, "cb_recommendations.csv"), index=False)
+            # Show ngay, ghi CSV ở thread nền
+            session.export(recs)
             
             msg = "Top Recommendations:\n"
-            for _, row in recs.head(10).iterrows():
-                msg += f"{row['Name']} - Score: {row['Score']:.2f}\n"
+            for name, score in zip(recs['Name'].head(10), recs['Score'].head(10)):
+                msg += f"{name} - Score: {score:.2f}\n"
             
             if root: root.after(0, lambda: messagebox.showinfo('Result', msg))
 
@@ -167,4 +255,4 @@ def get_recommendations(dir_path, root=None, preloaded_recommender=None):
             if root: root.after(0, lambda: messagebox.showerror('Error', str(e)))
             print(e)
 
-    threading.Thread(target=_recommend, daemon=True).start()
\ No newline at end of file
+    threading.Thread(target=_recommend, daemon=True).start()
@@ -5,8 +5,21 @@ Fixed: Xử lý file CSV bị lệch cột (Header AppID chứa Tên Game)
 
 import pandas as pd
 import numpy as np
+import hashlib
 import json
 import os
+import pickle
+import sys
+import time
+
+# Danh mục game dùng chung (KNN_model/Game_catalog.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "KNN_model"))
+from Game_catalog import GameCatalog
+
+_catalog_cache = {}
+
+CACHE_VERSION = 2               # Tăng khi cách làm sạch đổi -> cache cũ tự bị bỏ
+CACHE_SUFFIX = ".cache.pkl"     # CB_games.csv -> CB_games.cache.pkl (DataFrame đã làm sạch, binary)
 
 def clean_currency(x):
     """Chuyển đổi giá tiền từ string sang float"""
@@ -30,15 +43,101 @@ def clean_number(x):
     except:
         return 0
 
-def load_games_csv(file_path):
+def clean_currency_column(values):
+    """
+    clean_currency cho cả cột (vector hóa): '$1,299.99' -> 1299.99, 'Free' / lỗi / NaN -> 0.0.
+    Chuỗi đã làm sạch đổi sang số bằng float() như bản cũ (numpy astype); có giá trị lỗi thì chạy lại clean_currency.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).astype(np.float64)
+    text = values.astype(str).str.lower().str.replace('$', '', regex=False).str.replace(',', '', regex=False).str.strip()
+    rest = ~(text.str.contains('free', regex=False) | values.isna() | (text == '')).to_numpy()
+    prices = np.zeros(len(values), dtype=np.float64)
+    try:
+        prices[rest] = text[rest].to_numpy(dtype=object).astype(np.float64)
+    except (ValueError, TypeError):
+        prices[rest] = values[rest].map(clean_currency).to_numpy(dtype=np.float64)
+    return pd.Series(prices, index=values.index, name=values.name)
+
+def clean_number_column(values):
+    """
+    clean_number cho cả cột (vector hóa): '1,234' -> 1234, '12.7' -> 12, lỗi / NaN -> 0.
+    Phần trước dấu '.' đổi sang số bằng int() như bản cũ (numpy astype); có giá trị lỗi (vd. '1e3') thì chạy lại clean_number.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return np.trunc(values.fillna(0)).astype(np.int64)
+    text = values.astype(str).str.replace(',', '', regex=False).str.replace(r'(?s)\..*', '', regex=True).str.strip()
+    rest = ~(values.isna() | (text == '')).to_numpy()
+    numbers = np.zeros(len(values), dtype=np.int64)
+    try:
+        numbers[rest] = text[rest].to_numpy(dtype=object).astype(np.int64)
+    except (ValueError, TypeError):
+        numbers[rest] = values[rest].map(clean_number).to_numpy(dtype=np.int64)
+    return pd.Series(numbers, index=values.index, name=values.name)
+
+def _file_signature(file_path, with_hash=False):
+    stat = os.stat(file_path)
+    signature = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if with_hash:
+        sha1 = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(block)
+        signature['sha1'] = sha1.hexdigest()
+    return signature
+
+def _load_cached_frame(file_path, cache_path):
+    """DataFrame đã làm sạch nếu cache còn khớp file nguồn (size + mtime, hoặc size + hash khi chỉ đổi mtime)"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception:
+        return None
+    if cached.get('version') != CACHE_VERSION:
+        return None
+    signature = _file_signature(file_path)
+    if signature['size'] != cached['signature']['size']:
+        return None
+    if signature['mtime'] != cached['signature']['mtime']:
+        # File bị touch / copy lại: chỉ dùng cache nếu nội dung (hash) vẫn như cũ
+        if _file_signature(file_path, with_hash=True)['sha1'] != cached['signature']['sha1']:
+            return None
+        cached['signature']['mtime'] = signature['mtime']
+        _write_cache(cache_path, cached)
+    return cached
+
+def _write_cache(cache_path, cached):
+    try:
+        with open(cache_path + ".tmp", 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_path + ".tmp", cache_path)
+    except Exception as e:
+        print(f'Could not write cache {cache_path}: {str(e)}')
+
+def load_games_csv(file_path, use_cache=True):
     """
-    Load games từ CSV file và làm sạch dữ liệu
+    Load games từ CSV file và làm sạch dữ liệu.
+    use_cache: lưu DataFrame đã làm sạch ra <tên file>.cache.pkl, lần sau load thẳng (không parse CSV)
+    nếu file nguồn không đổi (size, mtime, hash).
     """
     try:
         if not os.path.exists(file_path):
             print(f'File {file_path} not found.')
             return None
 
+        cache_path = os.path.splitext(file_path)[0] + CACHE_SUFFIX
+        if use_cache:
+            start = time.perf_counter()
+            cached = _load_cached_frame(file_path, cache_path)
+            if cached is not None:
+                df = cached['frame']
+                print(f"Data loaded from cache in {time.perf_counter() - start:.2f}s "
+                      f"(CSV parse + clean: {cached['parse_seconds']:.2f}s). Shape: {df.shape}")
+                return df
+
+        start = time.perf_counter()
         # Load CSV. Cột đầu tiên (index_col=0) là AppID thật (số)
         df = pd.read_csv(file_path, index_col=0)
         
@@ -56,25 +155,48 @@ def load_games_csv(file_path):
 
         # --- CHUYỂN ĐỔI DỮ LIỆU SANG SỐ ---
         if 'Price' in df.columns:
-            df['Price'] = df['Price'].apply(clean_currency)
+            df['Price'] = clean_currency_column(df['Price'])
             
         if 'Positive' in df.columns:
-            df['Positive'] = df['Positive'].apply(clean_number)
+            df['Positive'] = clean_number_column(df['Positive'])
             
         if 'Negative' in df.columns:
-            df['Negative'] = df['Negative'].apply(clean_number)
+            df['Negative'] = clean_number_column(df['Negative'])
             
         # Fill NA cho Genres và Tags để tránh lỗi khi train
         df['Genres'] = df['Genres'].fillna('')
         df['Tags'] = df['Tags'].fillna('')
+        parse_seconds = time.perf_counter() - start
 
-        print(f"Data loaded successfully. Shape: {df.shape}")
+        if use_cache:
+            signature = _file_signature(file_path, with_hash=True)
+            _write_cache(cache_path, {'version': CACHE_VERSION, 'signature': signature, 'parse_seconds': parse_seconds, 'frame': df})
+
+        print(f"Data loaded successfully in {parse_seconds:.2f}s. Shape: {df.shape}")
         return df
         
     except Exception as e:
         print(f'Error loading CSV: {str(e)}')
         return None
 
+def load_games_catalog(file_path):
+    """
+    load_games_csv + GameCatalog, cache theo (đường dẫn, mtime):
+    UI, Save Ratings và Get Recommendations dùng chung 1 bản, không đọc lại CSV mỗi lần bấm nút.
+    """
+    if not os.path.exists(file_path):
+        print(f'File {file_path} not found.')
+        return None
+    path = os.path.abspath(file_path)
+    mtime = os.path.getmtime(path)
+    cached = _catalog_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        df = load_games_csv(path)
+        if df is None: return None
+        cached = (mtime, GameCatalog.from_cb_games(df))
+        _catalog_cache[path] = cached
+    return cached[1]
+
 def create_games_dict(df):
     """
     Tạo dictionary từ DataFrame để hiển thị trong UI
@@ -1,58 +1,474 @@
 """
 Content-Based Filtering Model (TF-IDF + SVD)
+
+Model lưu thành 1 thư mục (MODEL_DIR_NAME) thay vì 1 file pickle:
+- features.npy (float32, đã chuẩn hóa L2), norms.npy, app_ids.npy: load bằng mmap_mode,
+  nhiều process dùng chung trang bộ nhớ của OS, không copy
+- manifest.json: version, shape, dtype và data_hash (hash của Genres/Tags đã dùng để train)
+  -> biết model đã cũ so với CB_games.csv hiện tại
+- transformers.pkl: TF-IDF vectorizer + SVD, chỉ load khi thật sự cần transform game mới
+- delta_*.npy: game đã fold-in (update_games) sau lần save_model gần nhất, ghi bằng save_delta
+- ann_*.npy: ANN index IVF (ContentBased_ann.py) nếu có build
+- neighbours.npy / neighbour_sims.npy: bảng "more like this" (top-N game giống nhất của từng game)
 """
 
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
 from sklearn.decomposition import TruncatedSVD
+from scipy.sparse import vstack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import json
 import pickle
 import os
+import shutil
+import sys
+import time
+
+MODEL_DIR_NAME = "cb_model"
+LEGACY_MODEL_FILE = "cb_model.pkl"
+MODEL_VERSION = 1
+
+MAX_FEATURES = 5000        # Cấu hình TF-IDF (dùng chung cho đường hashing)
+MIN_DF = 2
+MAX_DF = 0.7
+SVD_COMPONENTS = 100
+HASH_FEATURES = 2 ** 20     # Số cột của HashingVectorizer (trước khi lọc theo min_df / max_df / max_features)
+HASH_CHUNK = 20000          # Số game mỗi chunk khi tokenize song song
+
+DRIFT_RETRAIN = 0.15        # drift_report: nên train lại khi năng lượng giữ lại của game fold-in giảm > 15%
+FOLD_RETRAIN_SHARE = 0.2    # ... hoặc khi game fold-in chiếm > 20% catalog
+DELTA_ARRAYS = ['features', 'norms', 'app_ids']
+
+NEIGHBOURS = 250            # Bảng neighbour: số game giống nhất lưu cho mỗi game (> top_n = 200 của UI)
+NEIGHBOUR_BLOCK_BYTES = 2 ** 27  # Mỗi khối nhân ma trận khi build bảng: (số dòng x n_games) float32 <= 128MB
+NEIGHBOUR_MAX_GAMES = 3     # Profile <= 3 game -> lấy ứng viên từ bảng thay vì chấm toàn bộ catalog
+NEIGHBOUR_SIM_TOLERANCE = 1e-5  # Sai số float32 giữa lúc build bảng (GEMM) và lúc query (GEMV)
+
+QUANT_SCALE = 127           # int8: mỗi dòng chia theo |max| của dòng rồi nhân 127
+QUANT_MARGIN = 0.05         # Nới ngưỡng similarity khi lọc bằng điểm int8 (sai số lượng tử hóa)
+RESCORE_FACTOR = 4          # int8: chấm lại chính xác (float32) top_n * RESCORE_FACTOR ứng viên
+QUANT_BLOCK = 65536         # Số dòng int8 đổi sang float32 mỗi lần (giới hạn bộ nhớ tạm)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "KNN_model"))
+from Game_catalog import GameCatalog
+from ContentBased_ann import IVFIndex
+
+
+class StageTimer:
+    """Cộng dồn thời gian + số dòng của từng bước train, in bảng báo cáo ở cuối"""
 
-class ContentBasedRecommender:
     def __init__(self):
-        self.vectorizer = None
-        self.svd = None 
-        self.game_features = None
+        self.stages = {}
+
+    def add(self, name, seconds, rows=0):
+        total_seconds, total_rows = self.stages.get(name, (0.0, 0))
+        self.stages[name] = (total_seconds + seconds, total_rows + rows)
+
+    def report(self):
+        print("-" * 60)
+        print(f"{'Stage':<28} | {'Time (s)':>10} | {'Rows':>14}")
+        print("-" * 60)
+        for name, (seconds, rows) in self.stages.items():
+            print(f"{name:<28} | {seconds:>10.2f} | {rows:>14,}")
+        print("-" * 60)
+        print(f"{'Total':<28} | {sum(s for s, _ in self.stages.values()):>10.2f} |")
+
+
+def data_hash(df):
+    """Hash nội dung dùng để train (AppID + Genres + Tags)"""
+    columns = [c for c in ('Genres', 'Tags') if c in df.columns]
+    hashed = pd.util.hash_pandas_object(df[columns], index=True).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+
+def find_model_path(dir_path):
+    """Thư mục model trong dir_path; nếu chưa có thì file cb_model.pkl cũ; None nếu chưa train"""
+    for name in (MODEL_DIR_NAME, LEGACY_MODEL_FILE):
+        path = os.path.join(dir_path, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def remove_model(dir_path):
+    """Xóa model đã train (cả thư mục mới lẫn file pickle cũ)"""
+    shutil.rmtree(os.path.join(dir_path, MODEL_DIR_NAME), ignore_errors=True)
+    legacy_path = os.path.join(dir_path, LEGACY_MODEL_FILE)
+    if os.path.exists(legacy_path): os.remove(legacy_path)
+
+
+def _save_array(dir_path, name, array):
+    """Ghi file tạm rồi os.replace: process khác đang mmap bản cũ không bị ghi đè"""
+    path = os.path.join(dir_path, name + ".npy")
+    np.save(path + ".tmp.npy", array)
+    os.replace(path + ".tmp.npy", path)
+
+
+def _hash_counts(texts):
+    """Đếm từ (đã hash) của 1 chunk - chạy trong process con"""
+    hasher = HashingVectorizer(n_features=HASH_FEATURES, stop_words='english', alternate_sign=False, norm=None)
+    return hasher.transform(texts)
+
+
+class HashedTfidf:
+    """
+    Thay cho TfidfVectorizer khi catalog lớn: HashingVectorizer không cần học từ điển nên từng chunk
+    được tokenize song song trên n_jobs process; sau đó lọc cột theo min_df / max_df / max_features
+    như TfidfVectorizer và nhân IDF (TfidfTransformer). Có fit_transform / transform như vectorizer thường.
+    """
+
+    def __init__(self, n_jobs=1, max_features=MAX_FEATURES, min_df=MIN_DF, max_df=MAX_DF):
+        self.n_jobs = n_jobs
+        self.max_features = max_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.columns = None
+        self.tfidf = None
+
+    def _counts(self, texts):
+        texts = list(texts)
+        chunks = [texts[i:i + HASH_CHUNK] for i in range(0, len(texts), HASH_CHUNK)] or [[]]
+        if self.n_jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as pool:
+                parts = list(pool.map(_hash_counts, chunks))
+        else:
+            parts = [_hash_counts(chunk) for chunk in chunks]
+        return vstack(parts).tocsr()
+
+    def fit_transform(self, texts):
+        counts = self._counts(texts)
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        keep = np.flatnonzero((doc_freq >= self.min_df) & (doc_freq <= self.max_df * counts.shape[0]))
+        if len(keep) > self.max_features:
+            # Giữ các cột có tổng tần suất cao nhất (giống max_features của TfidfVectorizer)
+            term_freq = np.asarray(counts[:, keep].sum(axis=0)).ravel()
+            keep = np.sort(keep[np.argsort(-term_freq, kind='stable')[:self.max_features]])
+        self.columns = keep
+        self.tfidf = TfidfTransformer()
+        return self.tfidf.fit_transform(counts[:, keep])
+
+    def transform(self, texts):
+        return self.tfidf.transform(self._counts(texts)[:, self.columns])
+
+
+def _top_candidates(candidates, scores, k):
+    """k ứng viên điểm cao nhất (argpartition), sắp giảm dần; hòa điểm -> index nhỏ trước"""
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class ContentBasedRecommender:
+    def __init__(self, quantized=False):
+        """quantized=True: chấm điểm bằng bản int8 rồi chấm lại chính xác 1 shortlist"""
+        self._vectorizer = None
+        self._svd = None
+        self._transformers_path = None  # transformers.pkl chưa load (lazy)
+        self.data_hash = None
+        self.is_stale = False
+        self.baseline_energy = None     # trung bình norm^2 (năng lượng TF-IDF giữ lại sau SVD) của tập train
+        self.delta_ids = {}             # app_id đã fold-in từ lần save_model gần nhất (dict giữ thứ tự)
+        self.game_features = None   # float32, mỗi dòng đã chuẩn hóa L2 (cosine = 1 phép nhân ma trận-vector)
+        self.feature_norms = None   # độ dài gốc của từng dòng SVD (để dựng lại user profile như cũ)
+        self.quantized = quantized
+        self.quantized_features = None
+        self.quantized_scales = None
+        self.ann_index = None           # IVFIndex (tùy chọn): chỉ chấm điểm game trong vài cụm gần nhất (quantized: int8 trên các cụm đó)
+        self.neighbours = None          # int32 (n_games x N): dòng của N game giống nhất, giảm dần
+        self.neighbour_sims = None      # float16 (n_games x N): similarity tương ứng
         self.game_indices = None
+        self.game_columns = {}  # app_id -> dòng trong game_features
         self.is_trained = False
+        self._aligned = (None, None)
+    
+    @property
+    def vectorizer(self):
+        self._load_transformers()
+        return self._vectorizer
+
+    @vectorizer.setter
+    def vectorizer(self, value):
+        self._vectorizer = value
+
+    @property
+    def svd(self):
+        self._load_transformers()
+        return self._svd
+
+    @svd.setter
+    def svd(self, value):
+        self._svd = value
+
+    def _load_transformers(self):
+        if self._transformers_path is not None:
+            path, self._transformers_path = self._transformers_path, None
+            with open(path, 'rb') as f: data = pickle.load(f)
+            self._vectorizer = data['vec']
+            self._svd = data['svd']
+
+    def _set_game_indices(self, game_indices):
+        self.game_indices = np.asarray(game_indices, dtype=np.int64)
+        self.game_columns = {app_id: idx for idx, app_id in enumerate(self.game_indices.tolist())}
+        self._aligned = (None, None)
+
+    def _set_features(self, features, norms=None):
+        """
+        features: ma trận SVD gốc (norms=None) hoặc ma trận đã chuẩn hóa kèm norms.
+        Lưu float32 đã chuẩn hóa L2 -> similarity = game_features @ query, không chuẩn hóa lại mỗi lần.
+        """
+        features = np.asarray(features)
+        if norms is None:
+            norms = np.linalg.norm(features, axis=1)
+            features = features / np.where(norms > 0, norms, 1.0)[:, None]
+        self.game_features = np.ascontiguousarray(features, dtype=np.float32)
+        self.feature_norms = np.asarray(norms, dtype=np.float64)
+        self.quantized_features = self.quantized_scales = None
+        if self.quantized:
+            self.quantize()
+
+    def quantize(self):
+        """Bản int8 của game_features (scale riêng từng dòng): nhẹ hơn float32 4 lần"""
+        row_max = np.abs(self.game_features).max(axis=1) if self.game_features.size else np.zeros(len(self.game_features))
+        scales = np.where(row_max > 0, row_max, 1.0) / QUANT_SCALE
+        self.quantized_features = np.rint(self.game_features / scales[:, None].astype(np.float32)).astype(np.int8)
+        self.quantized_scales = scales.astype(np.float32)
+
+    def _quantized_similarities(self, query, rows=None):
+        """Điểm xấp xỉ từ bản int8 (toàn bộ, hoặc chỉ các dòng rows), đổi sang float32 theo từng khối"""
+        if rows is None:
+            scores = np.empty(len(self.quantized_features), dtype=np.float32)
+            for start in range(0, len(scores), QUANT_BLOCK):
+                block = self.quantized_features[start:start + QUANT_BLOCK]
+                scores[start:start + QUANT_BLOCK] = block.astype(np.float32) @ query
+            return scores * self.quantized_scales
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), QUANT_BLOCK):
+            block = self.quantized_features[rows[start:start + QUANT_BLOCK]]
+            scores[start:start + QUANT_BLOCK] = block.astype(np.float32) @ query
+        return scores * self.quantized_scales[rows]
+
+    def _user_query(self, indices, weights):
+        """User profile (trung bình có trọng số của vector SVD gốc) đã chuẩn hóa L2, float32"""
+        raw = self.game_features[indices].astype(np.float64) * self.feature_norms[indices][:, None]
+        profile = np.average(raw, axis=0, weights=weights)
+        norm = np.linalg.norm(profile)
+        return (profile / norm if norm > 0 else profile).astype(np.float32)
+
+    def _catalog_arrays(self, catalog):
+        """
+        Các mảng của catalog xếp theo đúng dòng của game_features (tính 1 lần cho mỗi catalog),
+        gồm cả phần điểm không phụ thuộc user: hệ số phạt shovelware và điểm popularity.
+        """
+        if self._aligned[0] is not catalog:
+            rows = catalog.align(self.game_indices)
+            known = rows >= 0
+            safe_rows = np.where(known, rows, 0)
+
+            def take(values, fill):
+                if len(catalog) == 0: return np.full(len(rows), fill)
+                return np.where(known, values[safe_rows], fill)
+
+            price = take(catalog.price, 0.0)
+            reviews = take(catalog.reviews, 0.0)
+            arrays = {
+                'rows': rows,
+                'known': known,
+                'price': price,
+                'name_codes': take(pd.factorize(catalog.titles)[0], -1),
+                # Shovelware Filter: game ít review (<100) VÀ giá rẻ (<$10) -> phạt 75%, giá cao hơn -> phạt nhẹ
+                'penalty': np.where(reviews < 100, np.where(price < 9.99, 0.25, 0.9), 1.0),
+                # Popularity (log scale)
+                'popularity': np.log10(reviews + 1) / 10.0,
+            }
+            self._aligned = (catalog, arrays)
+        return self._aligned[1]
     
     def prepare_content_features(self, df):
-        content_features = []
-        for idx, row in df.iterrows():
-            genres = str(row.get('Genres', '')).replace(',', ' ')
-            tags = str(row.get('Tags', '')).replace(',', ' ')
-            
-            # Trọng số: Genres quan trọng gấp 4 lần
-            weighted_content = (genres + " ") * 4 + tags
-            content_features.append(weighted_content)
-        return content_features
+        def column(name):
+            if name not in df.columns: return pd.Series('', index=df.index)
+            return df[name].astype(str).str.replace(',', ' ', regex=False)
+
+        # Trọng số: Genres quan trọng gấp 4 lần
+        return ((column('Genres') + " ").str.repeat(4) + column('Tags')).tolist()
     
-    def train(self, df):
+    def train(self, df, vectorizer='tfidf', n_jobs=1, svd_algorithm='randomized', svd_n_iter=5, ann_lists=None):
+        """
+        vectorizer: 'tfidf' (TfidfVectorizer, mặc định) hoặc 'hashing' (HashedTfidf, tokenize song song)
+        n_jobs: số process cho đường 'hashing' (-1 = tất cả core)
+        svd_algorithm / svd_n_iter: solver của TruncatedSVD ('randomized' hoặc 'arpack')
+        ann_lists: build ANN index IVF (số cụm; 'auto' = ~4*sqrt(N)), None = chấm điểm toàn bộ catalog
+        """
+        timer = StageTimer()
         try:
             print("Preparing features...")
+            start = time.perf_counter()
             features = self.prepare_content_features(df)
+            timer.add("prepare features", time.perf_counter() - start, len(features))
             
-            print("Vectorizing (TF-IDF)...")
-            self.vectorizer = TfidfVectorizer(max_features=5000, stop_words='english', min_df=2, max_df=0.7)
+            start = time.perf_counter()
+            if vectorizer == 'hashing':
+                n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+                print(f"Vectorizing (Hashing + TF-IDF, {n_jobs} processes)...")
+                self.vectorizer = HashedTfidf(n_jobs=n_jobs)
+            else:
+                print("Vectorizing (TF-IDF)...")
+                self.vectorizer = TfidfVectorizer(max_features=MAX_FEATURES, stop_words='english', min_df=MIN_DF, max_df=MAX_DF)
             tfidf_matrix = self.vectorizer.fit_transform(features)
+            timer.add(f"vectorize ({vectorizer})", time.perf_counter() - start, len(features))
             
             print("Reducing dimensions (SVD)...")
+            start = time.perf_counter()
             # Giảm xuống 100 chiều để hiểu ngữ nghĩa tốt hơn
-            self.svd = TruncatedSVD(n_components=100, random_state=42)
-            self.game_features = self.svd.fit_transform(tfidf_matrix)
+            self.svd = TruncatedSVD(n_components=SVD_COMPONENTS, algorithm=svd_algorithm, n_iter=svd_n_iter, random_state=42)
+            self._set_features(self.svd.fit_transform(tfidf_matrix))
+            self.baseline_energy = float(np.mean(self.feature_norms ** 2)) if len(self.feature_norms) else 0.0
+            self.delta_ids = {}
+            timer.add(f"svd ({svd_algorithm})", time.perf_counter() - start, len(features))
+
+            self.ann_index = None
+            self.neighbours = self.neighbour_sims = None
+            if ann_lists:
+                start = time.perf_counter()
+                self.build_ann_index(None if ann_lists == 'auto' else ann_lists)
+                timer.add("ann index (ivf)", time.perf_counter() - start, len(features))
             
-            self.game_indices = df.index.tolist()
+            self._set_game_indices(df.index.to_numpy())
+            self.data_hash = data_hash(df)
+            self.is_stale = False
             self.is_trained = True
             print(f"Training complete. Matrix shape: {self.game_features.shape}")
+            timer.report()
             return True
         except Exception as e:
             print(f"Training failed: {e}")
             return False
     
+    def build_ann_index(self, n_lists=None, n_probe=None):
+        """Build ANN index IVF trên game_features (k-means n_lists cụm, xét n_probe cụm mỗi query)"""
+        self.ann_index = IVFIndex.build(self.game_features, n_lists, n_probe)
+        print(f"ANN index: {self.ann_index.n_lists} lists, n_probe={self.ann_index.n_probe}")
+        return self.ann_index
+
+    def build_neighbour_table(self, n_neighbours=NEIGHBOURS, n_jobs=None):
+        """
+        Top-N game giống nhất (cosine) của từng game: nhân ma trận theo khối NEIGHBOUR_BLOCK dòng,
+        các khối (<= NEIGHBOUR_BLOCK_BYTES) chạy song song trên n_jobs thread (BLAS / argpartition nhả GIL).
+        Lưu gọn: chỉ số int32 + similarity float16.
+        """
+        start = time.perf_counter()
+        n_games = len(self.game_features)
+        n_neighbours = min(n_neighbours, max(n_games - 1, 0))
+        neighbours = np.empty((n_games, n_neighbours), dtype=np.int32)
+        sims = np.empty((n_games, n_neighbours), dtype=np.float16)
+        block_rows = max(1, NEIGHBOUR_BLOCK_BYTES // (4 * max(n_games, 1)))
+
+        def build_block(block_start):
+            rows = np.arange(block_start, min(block_start + block_rows, n_games))
+            scores = self.game_features[rows] @ self.game_features.T
+            scores[np.arange(len(rows)), rows] = -np.inf  # bỏ chính nó
+            top = np.argpartition(-scores, n_neighbours - 1, axis=1)[:, :n_neighbours] if n_neighbours else np.empty((len(rows), 0), dtype=np.int64)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.lexsort((top, -top_scores), axis=1)
+            neighbours[rows] = np.take_along_axis(top, order, axis=1)
+            sims[rows] = np.take_along_axis(top_scores, order, axis=1)
+
+        with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+            list(pool.map(build_block, range(0, n_games, block_rows)))
+        self.neighbours, self.neighbour_sims = neighbours, sims
+        print(f"Neighbour table: {n_games} games x {n_neighbours} ({neighbours.nbytes + sims.nbytes:,} bytes) "
+              f"in {time.perf_counter() - start:.2f}s")
+        return neighbours
+
+    def similar_games(self, app_id, top_n=10):
+        """'More like this': (AppID, similarity) của các game giống app_id nhất, đọc thẳng từ bảng"""
+        row = self.game_columns.get(app_id)
+        if self.neighbours is None or row is None: return pd.DataFrame()
+        return pd.DataFrame({
+            'AppID': self.game_indices[self.neighbours[row, :top_n]],
+            'Similarity': self.neighbour_sims[row, :top_n].astype(np.float32),
+        })
+
+    def update_games(self, df_new, replace=True):
+        """
+        Fold-in game mới / đã sửa bằng vectorizer + SVD đã fit (không train lại).
+        Game đã có trong model: thay embedding (replace=True) hoặc bỏ qua. Trả về drift_report().
+        """
+        if not self.is_trained:
+            print("Model is not trained.")
+            return None
+        df_new = df_new[~df_new.index.duplicated(keep='last')]
+        if not replace:
+            df_new = df_new[~df_new.index.isin(self.game_indices)]
+        if df_new.empty:
+            print("No games to fold in.")
+            return self.drift_report()
+
+        start = time.perf_counter()
+        raw = self.svd.transform(self.vectorizer.transform(self.prepare_content_features(df_new)))
+        norms = np.linalg.norm(raw, axis=1)
+        replaced = self._apply_rows(df_new.index.to_numpy(dtype=np.int64), raw / np.where(norms > 0, norms, 1.0)[:, None], norms)
+        print(f"Folded in {len(df_new)} games ({len(df_new) - replaced} new, {replaced} updated) "
+              f"in {time.perf_counter() - start:.2f}s")
+        return self.drift_report()
+
+    def add_games(self, df_new):
+        """Chỉ thêm game chưa có trong model"""
+        return self.update_games(df_new, replace=False)
+
+    def _apply_rows(self, app_ids, features, norms):
+        """Thay dòng của app_id đã có, nối thêm app_id mới. Trả về số dòng bị thay"""
+        rows = np.array([self.game_columns.get(app_id, -1) for app_id in app_ids.tolist()], dtype=np.int64)
+        old = rows >= 0
+        # Bản copy trong RAM (features có thể đang mmap chỉ đọc)
+        all_features = np.array(self.game_features)
+        all_norms = np.array(self.feature_norms)
+        all_features[rows[old]] = features[old]
+        all_norms[rows[old]] = norms[old]
+        self._set_features(np.concatenate([all_features, features[~old]]), np.concatenate([all_norms, norms[~old]]))
+        self._set_game_indices(np.concatenate([self.game_indices, app_ids[~old]]))
+        if self.ann_index is not None:
+            n_old = len(all_norms)
+            rows = np.concatenate([rows[old], np.arange(n_old, n_old + int((~old).sum()))])
+            self.ann_index.update(rows, self.game_features[rows], len(self.game_indices))
+        if self.neighbours is not None:
+            self.neighbours = self.neighbour_sims = None
+            print("Neighbour table dropped after fold-in (rebuild with build_neighbour_table).")
+        self.delta_ids.update(dict.fromkeys(app_ids.tolist()))
+        return int(old.sum())
+
+    def drift_report(self):
+        """
+        Mức lệch của các game đã fold-in so với tập train:
+        - energy_ratio: norm^2 trung bình sau SVD (TF-IDF đã chuẩn hóa nên <= 1) của game fold-in / của tập train.
+          Game có genre / tag mới (ngoài từ điển hoặc ngoài không gian SVD) làm tỉ lệ này giảm.
+        - folded_share: tỉ lệ game đã fold-in trên toàn catalog.
+        retrain = True khi drift (1 - energy_ratio) > DRIFT_RETRAIN hoặc folded_share > FOLD_RETRAIN_SHARE.
+        """
+        folded = len(self.delta_ids)
+        energy_ratio = 1.0
+        if folded and self.baseline_energy:
+            rows = [self.game_columns[app_id] for app_id in self.delta_ids]
+            energy_ratio = float(np.mean(self.feature_norms[rows] ** 2)) / self.baseline_energy
+        drift = max(0.0, 1.0 - energy_ratio)
+        folded_share = folded / max(len(self.game_indices), 1)
+        report = {
+            'folded_games': folded,
+            'folded_share': folded_share,
+            'energy_ratio': energy_ratio,
+            'drift': drift,
+            'retrain': drift > DRIFT_RETRAIN or folded_share > FOLD_RETRAIN_SHARE,
+        }
+        print(f"Drift: {drift:.1%} over {folded} folded games ({folded_share:.1%} of catalog)"
+              + (" -> full retrain recommended" if report['retrain'] else ""))
+        return report
+
     def get_recommendations(self, df, rated_games, user_preferences=None, top_n=20):
+        """df: DataFrame game (index AppID) hoặc GameCatalog đã dựng sẵn"""
         if not self.is_trained: return pd.DataFrame()
+        catalog = df if isinstance(df, GameCatalog) else GameCatalog.from_cb_games(df)
+        arrays = self._catalog_arrays(catalog)
 
         # Lấy game user thích (Rating >= 3)
         liked_games = {aid: r for aid, r in rated_games.items() if r >= 3}
@@ -61,105 +477,234 @@ class ContentBasedRecommender:
         # Tìm index và trọng số
         indices = []
         weights = []
-        played_names = set()
         
         for app_id, rating in liked_games.items():
-            if app_id in self.game_indices:
-                idx = self.game_indices.index(app_id)
+            idx = self.game_columns.get(app_id)
+            if idx is not None:
                 indices.append(idx)
                 # Rating 5->3 điểm, 4->2 điểm, 3->1 điểm
                 weights.append(max(1, rating - 2))
-                
-                # Lưu tên để lọc trùng
-                row = df[df.index == app_id]
-                if not row.empty:
-                    played_names.add(row.iloc[0].get('Name', ''))
 
         if not indices: return pd.DataFrame()
 
-        # Tính User Profile (Trung bình cộng có trọng số)
-        user_profile = np.average(self.game_features[indices], axis=0, weights=weights).reshape(1, -1)
-        
-        # Tính độ tương đồng (Cosine Similarity)
-        # Vì game_features đã qua SVD (dense matrix) nên tính toán rất nhanh
-        similarities = cosine_similarity(user_profile, self.game_features).flatten()
+        # Tính User Profile (Trung bình cộng có trọng số), chuẩn hóa L2
+        query = self._user_query(indices, weights)
         
-        # Lọc kết quả
-        results = []
-        # Quét top N * 10 để lọc sau
-        top_indices = np.argsort(similarities)[::-1][:top_n*10]
-        
-        for idx in top_indices:
-            app_id = self.game_indices[idx]
-            score = similarities[idx]
-            
-            # Bỏ qua game đã chơi
-            row = df[df.index == app_id]
-            if row.empty: continue
-            
-            name = row.iloc[0].get('Name', 'Unknown')
-            if name in played_names: continue
-            if score < 0.1: continue # Bỏ qua nếu không giống lắm
-
-            # --- Shovelware Filter (Lọc rác) ---
-            pos = float(row.iloc[0].get('Positive', 0))
-            neg = float(row.iloc[0].get('Negative', 0))
-            price = float(row.iloc[0].get('Price', 0))
-            total_reviews = pos + neg
-
-            # Logic: Game ít review (<100) VÀ giá rẻ (<$10) -> Phạt nặng
-            final_score = score
-            if total_reviews < 100:
-                if price < 9.99:
-                    final_score *= 0.25 # Phạt 75%
-                else:
-                    final_score *= 0.9  # Phạt nhẹ
-
-            # Cộng điểm Popularity (Log scale)
-            pop_score = np.log10(total_reviews + 1) / 10.0
-            final_score = (final_score * 0.85) + (pop_score * 0.15)
-            
-            # Lọc theo Preference (Max Price)
-            if user_preferences:
-                max_p = user_preferences.get('max_price', 1000)
-                if price > max_p: final_score *= 0.5
-
-            results.append({
-                'AppID': app_id,
-                'Name': name,
-                'Score': final_score,
-                'Similarity': score,
-                'Price': price
-            })
-
-            if len(results) >= top_n: break
+        # Lọc: có trong catalog, chưa chơi (trùng tên)
+        name_codes = arrays['name_codes']
+        played_codes = name_codes[indices]
+        played_codes = played_codes[played_codes >= 0]
+
+        def eligible(rows):
+            return arrays['known'][rows] & ~np.isin(name_codes[rows], played_codes)
+
+        # Tính độ tương đồng (Cosine Similarity): features đã chuẩn hóa -> GEMV float32.
+        # pool: các dòng được chấm chính xác (toàn bộ catalog, hoặc shortlist của bảng neighbour / ANN / int8)
+        pool = None
+        if self.neighbours is not None and len(indices) <= NEIGHBOUR_MAX_GAMES and self.neighbours.shape[1]:
+            # Profile 1 (hoặc vài) game: ứng viên = hợp các neighbour đã tính sẵn
+            pool = np.unique(self.neighbours[indices])
+            similarities = self.game_features[pool] @ query
+            candidates = np.flatnonzero(eligible(pool) & (similarities >= 0.1))
+            # Game ngoài bảng của game i có similarity với i <= sim neighbour cuối của i (t_i) -> với
+            # profile = sum(c_i * u_i): similarity <= sum(c_i * t_i) / |profile|. Kết quả chỉ đúng khi
+            # game thứ top_n trong pool đạt cận này; nếu không (hoặc thiếu ứng viên) chấm như bình thường.
+            coefficients = np.asarray(weights, dtype=np.float64) * self.feature_norms[indices]
+            profile_norm = np.linalg.norm(coefficients @ self.game_features[indices].astype(np.float64))
+            last_rows = self.neighbours[indices, -1]
+            last_sims = np.einsum('ij,ij->i', self.game_features[indices], self.game_features[last_rows]) + NEIGHBOUR_SIM_TOLERANCE
+            bound = coefficients @ last_sims / profile_norm if profile_norm > 0 else np.inf
+            if len(candidates) < top_n or np.partition(similarities[candidates], len(candidates) - top_n)[len(candidates) - top_n] < bound:
+                pool = None
+
+        n_probe = None
+        while pool is None:
+            # IVF: chỉ xét game trong n_probe cụm gần nhất (None = toàn bộ catalog)
+            scanned = self.ann_index.search(query, n_probe) if self.ann_index is not None else None
+            if self.quantized_features is not None:
+                # int8 (trên vùng đã xét) -> shortlist -> chấm lại chính xác bằng float32 chỉ trên shortlist
+                rows = scanned if scanned is not None else np.arange(len(self.game_indices))
+                approx = self._quantized_similarities(query, scanned)
+                keep = np.flatnonzero(arrays['known'][rows] & (approx >= 0.1 - QUANT_MARGIN))
+                keep = keep[eligible(rows[keep])]
+                pool = np.sort(rows[_top_candidates(keep, approx, top_n * RESCORE_FACTOR)])
+            elif scanned is not None:
+                pool = scanned
+            else:
+                pool = np.arange(len(self.game_indices))
+            similarities = self.game_features[pool] @ query if len(pool) < len(self.game_indices) else self.game_features @ query
+            candidates = np.flatnonzero(eligible(pool) & (similarities >= 0.1))
+
+            # ANN chưa đủ top_n ứng viên -> mở rộng số cụm được xét
+            if self.ann_index is not None and len(candidates) < top_n and len(scanned) < len(self.game_indices):
+                n_probe = 2 * (n_probe or self.ann_index.n_probe)
+                pool = None
+
+        if len(candidates) < top_n:
+            print(f"Only {len(candidates)} games pass the filters (top_n={top_n}).")
+
+        # Top-n theo độ tương đồng bằng argpartition, rồi sắp xếp giảm dần
+        candidates = _top_candidates(candidates, similarities, top_n)
+        score = similarities[candidates]
+        candidates = pool[candidates]
+
+        price = arrays['price'][candidates]
+        final_score = (score * arrays['penalty'][candidates]) * 0.85 + arrays['popularity'][candidates] * 0.15
         
-        return pd.DataFrame(results)
+        # Lọc theo Preference (Max Price)
+        if user_preferences:
+            max_p = user_preferences.get('max_price', 1000)
+            final_score = np.where(price > max_p, final_score * 0.5, final_score)
+
+        return pd.DataFrame({
+            'AppID': self.game_indices[candidates],
+            'Name': catalog.titles[arrays['rows'][candidates]],
+            'Score': final_score,
+            'Similarity': score,
+            'Price': price
+        })
 
     def save_model(self, path):
+        """Ghi model ra thư mục path (các mảng .npy + manifest.json + transformers.pkl)"""
+        if not self.is_trained:
+            print("Save failed: model is not trained.")
+            return False
         try:
-            data = {
-                'vec': self.vectorizer, 'svd': self.svd, 
-                'feats': self.game_features, 'inds': self.game_indices, 
-                'trained': self.is_trained
+            os.makedirs(path, exist_ok=True)
+            _save_array(path, "features", self.game_features)
+            _save_array(path, "norms", self.feature_norms)
+            _save_array(path, "app_ids", self.game_indices)
+            transformers = {'vec': self.vectorizer, 'svd': self.svd}  # load (lazy) trước khi ghi đè file
+            with open(os.path.join(path, "transformers.pkl"), 'wb') as f:
+                pickle.dump(transformers, f)
+
+            manifest = {
+                'version': MODEL_VERSION,
+                'shape': list(self.game_features.shape),
+                'dtype': str(self.game_features.dtype),
+                'data_hash': self.data_hash,
+                'baseline_energy': self.baseline_energy,
+                'delta_rows': 0,
+                'ann': None,
             }
-            with open(path, 'wb') as f: pickle.dump(data, f)
+            if self.ann_index is not None:
+                _save_array(path, "ann_centroids", self.ann_index.centroids)
+                _save_array(path, "ann_labels", self.ann_index.labels)
+                manifest['ann'] = {'n_lists': self.ann_index.n_lists, 'n_probe': self.ann_index.n_probe}
+            manifest['neighbours'] = None
+            if self.neighbours is not None:
+                _save_array(path, "neighbours", self.neighbours)
+                _save_array(path, "neighbour_sims", self.neighbour_sims)
+                manifest['neighbours'] = self.neighbours.shape[1]
+            # Manifest ghi sau cùng: thư mục chỉ hợp lệ khi đã ghi xong các mảng
+            self._write_manifest(path, manifest)
+            for name in DELTA_ARRAYS:
+                delta_path = os.path.join(path, f"delta_{name}.npy")
+                if os.path.exists(delta_path): os.remove(delta_path)
+            self.delta_ids = {}
             print(f"Model saved to {path}")
             return True
         except Exception as e:
             print(f"Save failed: {e}")
             return False
 
-    def load_model(self, path):
+    def save_delta(self, path, df=None):
+        """
+        Chỉ ghi các game đã fold-in từ lần save_model gần nhất (delta_*.npy), bản đầy đủ giữ nguyên.
+        df: toàn bộ dữ liệu game hiện tại -> cập nhật data_hash để load_model không báo model cũ.
+        """
+        manifest_path = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return self.save_model(path)  # Chưa có bản đầy đủ
         try:
-            with open(path, 'rb') as f: data = pickle.load(f)
-            self.vectorizer = data['vec']
-            self.svd = data['svd']
-            self.game_features = data['feats']
-            self.game_indices = data['inds']
-            self.is_trained = data['trained']
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            app_ids = np.fromiter(self.delta_ids, dtype=np.int64, count=len(self.delta_ids))
+            rows = np.array([self.game_columns[app_id] for app_id in self.delta_ids], dtype=np.int64)
+            _save_array(path, "delta_features", self.game_features[rows])
+            _save_array(path, "delta_norms", self.feature_norms[rows])
+            _save_array(path, "delta_app_ids", app_ids)
+
+            if df is not None:
+                self.data_hash = data_hash(df)
+            manifest['data_hash'] = self.data_hash
+            manifest['delta_rows'] = len(app_ids)
+            if self.neighbours is None:
+                manifest['neighbours'] = None  # Bảng cũ không còn đúng sau fold-in
+            self._write_manifest(path, manifest)
+            print(f"Model delta ({len(app_ids)} games) saved to {path}")
+            return True
+        except Exception as e:
+            print(f"Save failed: {e}")
+            return False
+
+    @staticmethod
+    def _write_manifest(path, manifest):
+        with open(os.path.join(path, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    def load_model(self, path, df=None, mmap_mode='r'):
+        """
+        path: thư mục model (hoặc file cb_model.pkl cũ).
+        df: dữ liệu game hiện tại -> so data_hash, đặt is_stale nếu model đã cũ (cần train lại).
+        """
+        try:
+            if os.path.isdir(path):
+                self._load_model_dir(path, mmap_mode)
+            else:
+                self._load_legacy_pickle(path)
+            # Model pickle cũ không có data_hash -> không kiểm tra được
+            self.is_stale = df is not None and self.data_hash is not None and self.data_hash != data_hash(df)
+            if self.is_stale:
+                print(f"Model at {path} is out of date with the current game data. Please retrain.")
             print(f"Model loaded form {path}")
             return True
         except Exception as e:
             print(f"Load failed: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def _load_model_dir(self, path, mmap_mode):
+        with open(os.path.join(path, "manifest.json"), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MODEL_VERSION:
+            raise ValueError(f"unsupported model version {manifest.get('version')}")
+
+        features = np.load(os.path.join(path, "features.npy"), mmap_mode=mmap_mode)
+        if list(features.shape) != manifest['shape'] or str(features.dtype) != manifest['dtype']:
+            raise ValueError("features.npy does not match manifest.json")
+        self._set_features(features, np.load(os.path.join(path, "norms.npy")))
+        self._set_game_indices(np.load(os.path.join(path, "app_ids.npy"), mmap_mode=mmap_mode))
+        self._vectorizer = self._svd = None
+        self._transformers_path = os.path.join(path, "transformers.pkl")
+        self.data_hash = manifest.get('data_hash')
+        self.baseline_energy = manifest.get('baseline_energy')
+        self.delta_ids = {}
+        self.ann_index = None
+        if manifest.get('ann'):
+            self.ann_index = IVFIndex(
+                np.load(os.path.join(path, "ann_centroids.npy")),
+                np.load(os.path.join(path, "ann_labels.npy"), mmap_mode=mmap_mode),
+                manifest['ann'].get('n_probe')
+            )
+        self.neighbours = self.neighbour_sims = None
+        if manifest.get('neighbours'):
+            self.neighbours = np.load(os.path.join(path, "neighbours.npy"), mmap_mode=mmap_mode)
+            self.neighbour_sims = np.load(os.path.join(path, "neighbour_sims.npy"), mmap_mode=mmap_mode)
+        if manifest.get('delta_rows'):
+            delta = {name: np.load(os.path.join(path, f"delta_{name}.npy")) for name in DELTA_ARRAYS}
+            self._apply_rows(delta['app_ids'], delta['features'], delta['norms'])
+        self.is_trained = True
+
+    def _load_legacy_pickle(self, path):
+        with open(path, 'rb') as f: data = pickle.load(f)
+        self.vectorizer = data['vec']
+        self.svd = data['svd']
+        # Model cũ chỉ có ma trận SVD gốc (không có 'norms') -> chuẩn hóa khi load
+        self._set_features(data['feats'], data.get('norms'))
+        self._set_game_indices(data['inds'])
+        self.data_hash = None
+        self.baseline_energy = float(np.mean(self.feature_norms ** 2)) if len(self.feature_norms) else 0.0
+        self.delta_ids = {}
+        self.ann_index = None
+        self.neighbours = self.neighbour_sims = None
+        self.is_trained = data['trained']
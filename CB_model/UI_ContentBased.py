@@ -11,7 +11,8 @@ import pandas as pd
 import threading
 import ContentBased_data_handler as cb_handler
 import ContentBased_UI_elements as cb_elements
-from ContentBased_model import ContentBasedRecommender
+import ContentBased_commands as cb_commands
+from ContentBased_model import find_model_path
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -25,7 +26,8 @@ print("Loading games data...")
 print("Please wait while loading data (this may take a few seconds for large files)...")
 
 try:
-    df_games = cb_handler.load_games_csv(games_csv_path)
+    catalog = cb_handler.load_games_catalog(games_csv_path)
+    df_games = catalog.frame if catalog is not None else None
     
     if df_games is None or df_games.empty:
         print("Warning: Could not load CB_games.csv")
@@ -38,6 +40,7 @@ try:
 except Exception as e:
     print(f"Error loading data: {str(e)}")
     df_games = pd.DataFrame()
+    catalog = None
     games_dict = {}
 
 # Initialize user ratings dictionary
@@ -55,19 +58,16 @@ if os.path.exists(ratings_file):
                 rating_text = {1: 'Dislike', 2: 'Bad', 3: 'Neutral', 4: 'Good', 5: 'Like'}
                 user_ratings_dict[game_name] = f"Name: {game_name} ¬ Rating: {rating} ({rating_text.get(rating, 'Unknown')})"
 
-# Pre-load model in background (nếu đã train)
-recommender = None
-model_path = os.path.join(dir_path, "cb_model.pkl")
+# Pre-load model in background (nếu đã train) vào session dùng chung với các nút bấm
+session = cb_commands.get_session(dir_path)
+model_path = find_model_path(dir_path)
 
 def preload_model():
     """Pre-load model trong background để không lag khi get recommendations"""
-    global recommender
-    if os.path.exists(model_path):
+    if model_path is not None:
         print("Pre-loading model in background...")
         try:
-            temp_recommender = ContentBasedRecommender()
-            if temp_recommender.load_model(model_path):
-                recommender = temp_recommender
+            if session.model() is not None:
                 print("Model pre-loaded successfully!")
             else:
                 print("Failed to pre-load model (will load when needed)")
@@ -75,7 +75,7 @@ def preload_model():
             print(f"Error pre-loading model: {str(e)} (will load when needed)")
 
 # Start pre-loading in background thread
-if os.path.exists(model_path):
+if model_path is not None:
     preload_thread = threading.Thread(target=preload_model, daemon=True)
     preload_thread.start()
 
@@ -104,9 +104,9 @@ rating_buttons_frame = cb_elements.rating_buttons_frame(
 # Preferences Frame
 preferences_frame, price_entry = cb_elements.preferences_frame(root)
 
-# Recommendations Frame (truyền pre-loaded recommender nếu có)
+# Recommendations Frame (model / catalog / ratings lấy từ session)
 recommendations_frame = cb_elements.recommendations_frame(
-    root, user_ratings_dict, dir_path, df_games, recommender=recommender
+    root, user_ratings_dict, dir_path, catalog
 )
 
 # Footer
@@ -114,6 +114,13 @@ footer_label = tk.Label(root, text='Content-Based Filtering - Uses Genres & Tags
                        font=('Arial', 10), fg='gray')
 footer_label.pack(pady=5)
 
+def on_close():
+    """Đóng cửa sổ: chờ ghi xong cb_recommendations.csv (Hybrid đọc file này ngay sau đó)"""
+    session.flush()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
 print("Content-Based UI initialized successfully!")
 print(f"Loaded {len(games_dict)} games")
 
@@ -1,57 +1,40 @@
 import pandas as pd
 import os
-import re
 import shutil
+import sys
 
-# --- CẤU HÌNH ---
-knn_path = os.path.join("KNN_model", "final_games.csv")
-cb_path = os.path.join("CB_model", "CB_games.csv")
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "KNN_model"))
+from Game_crosswalk import build_game_crosswalk
 
-def normalize_name(title):
-    if not isinstance(title, str): return ""
-    # Chuyển về chữ thường, chỉ giữ lại chữ và số
-    return re.sub(r'[^a-z0-9]', '', title.lower())
+# --- CẤU HÌNH ---
+knn_dir = "KNN_model"
+cb_dir = "CB_model"
+knn_path = os.path.join(knn_dir, "final_games.csv")
+cb_path = os.path.join(cb_dir, "CB_games.csv")
 
 def reduce_dataset_fixed():
     print("="*50)
     print("DATA REDUCTION TOOL (FIXED COLUMN MISMATCH)")
     print("="*50)
 
-    # 1. Load KNN (File chuẩn)
-    print("1. Đang đọc KNN data...")
-    try:
-        df_knn = pd.read_csv(knn_path)
-        # Tạo danh sách các tên game hợp lệ (Whitelist)
-        # Chuẩn hóa tên để so sánh chính xác hơn
-        valid_titles = set(df_knn['title'].apply(normalize_name))
-        print(f"-> Đã load {len(df_knn)} game từ KNN làm chuẩn.")
-    except Exception as e:
-        print(f"Lỗi đọc KNN: {e}")
+    # 1. Bảng đối chiếu KNN <-> CB (tên chuẩn hóa chỉ tính 1 lần ở đây, dùng lại cho Hybrid)
+    print("1. Đang đối chiếu game KNN <-> CB (Game Crosswalk)...")
+    crosswalk = build_game_crosswalk(knn_dir, cb_dir)
+    if crosswalk is None:
+        print(f"Lỗi: không build được bảng đối chiếu từ {knn_path} và {cb_path}")
         return
+    valid_ids = crosswalk.matched_ids('cb')
 
     # 2. Load CB (File bị lệch cột)
     print("2. Đang đọc CB data...")
     try:
-        df_cb = pd.read_csv(cb_path)
+        # Cột đầu tiên (không tên) là AppID thật; giữ nguyên cấu trúc lệch cột khi ghi lại
+        df_cb = pd.read_csv(cb_path, index_col=0)
         original_count = len(df_cb)
         print(f"-> CB data gốc: {original_count} dòng.")
         
-        # --- QUAN TRỌNG: XỬ LÝ LỆCH CỘT ---
-        # Trong file CB của bạn: Header 'AppID' chứa Tên Game.
-        # Chúng ta sẽ dùng cột này để so sánh.
-        print("-> Đang xử lý đối chiếu tên game (Mapping)...")
-        
-        # Tạo cột tạm chứa tên đã chuẩn hóa từ cột 'AppID' (thực chất là Tên)
-        # Chuyển sang string trước khi normalize để tránh lỗi nếu có số
-        df_cb['temp_norm_name'] = df_cb['AppID'].astype(str).apply(normalize_name)
-        
-        # LOGIC LỌC: Giữ lại những dòng mà tên game (cột AppID) có trong danh sách KNN
-        mask = df_cb['temp_norm_name'].isin(valid_titles)
-        
-        df_cb_reduced = df_cb[mask].copy()
-        
-        # Xóa cột tạm
-        df_cb_reduced.drop(columns=['temp_norm_name'], inplace=True)
+        # LOGIC LỌC: Giữ lại những game CB có game trùng tên bên KNN (theo bảng đối chiếu)
+        df_cb_reduced = df_cb[df_cb.index.isin(list(valid_ids))]
         
         new_count = len(df_cb_reduced)
         print(f"-> Kết quả lọc: Giữ lại {new_count} game (trùng khớp với KNN).")
@@ -70,8 +53,10 @@ def reduce_dataset_fixed():
         
         # Lưu đè file CB_games.csv
         # Quan trọng: Giữ nguyên cấu trúc lệch cột để không làm hỏng code load data hiện tại của bạn
-        df_cb_reduced.to_csv(cb_path, index=False)
+        df_cb_reduced.to_csv(cb_path)
         print(f"✅ THÀNH CÔNG! File {cb_path} đã được làm gọn.")
+        # Dữ liệu CB đã đổi -> build lại bảng đối chiếu cho Hybrid
+        build_game_crosswalk(knn_dir, cb_dir)
         print("-" * 50)
         print("HƯỚNG DẪN TIẾP THEO:")
         print("1. Mở App 'Game Recommendation'.")
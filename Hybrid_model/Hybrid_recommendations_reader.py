@@ -2,21 +2,64 @@
 Hybrid Recommendations Reader (Final Fix)
 Fixed: 
 1. Tự động tìm AppID từ final_games.csv nếu file kết quả KNN bị thiếu.
-2. Ghép dữ liệu bằng Tên Game (Name Matching) để khắc phục lệch ID.
+2. Ghép dữ liệu bằng bảng đối chiếu ID (Game_crosswalk, build sẵn) để khắc phục lệch ID;
+   Tên Game (Name Matching) chỉ là dự phòng khi chưa có bảng.
 """
 
 import pandas as pd
+import numpy as np
 import os
 import re
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "KNN_model"))
+from Game_catalog import load_game_catalog
+from Game_crosswalk import load_game_crosswalk
+
+# --- CẤU HÌNH ---
+SYNERGY_BOOST = 0.5          # Game có ở cả 2 model: + sqrt(knn_norm * cb_norm) * 0.5
+SINGLE_SOURCE_PENALTY = 0.8  # Game chỉ có ở 1 model: điểm x 0.8
+
 # Hàm chuẩn hóa tên để so sánh
 def normalize_name(title):
     if not isinstance(title, str): return ""
     # Chuyển về chữ thường, bỏ ký tự đặc biệt
     return re.sub(r'[^a-z0-9]', '', title.lower())
 
-def read_knn_recommendations(knn_dir, top_n=200):
+def prepare_knn_recommendations(df, catalog=None, top_n=200, crosswalk=None):
+    """
+    Chuẩn hóa kết quả KNN (KNNRecommender.recommend có app_id, hoặc rcm_games.csv chỉ có tên) để ghép Hybrid.
+    catalog: GameCatalog của KNN để tìm lại AppID theo tên khi thiếu cột app_id (rcm_games.csv; None -> AppID = 0)
+    crosswalk: GameCrosswalk -> thêm cột canonical_key (ghép bằng số nguyên), None -> normalized_title
+    """
+    df = df.head(top_n).copy()
+    if 'app_id' not in df.columns:
+        df['app_id'] = catalog.app_ids_of_titles(df['title']).to_numpy() if catalog is not None else 0
+
+    # Đổi tên cột chuẩn hóa
+    rename_map = {'relevance': 'knn_score', 'app_id': 'app_id_knn', 'title': 'title_knn'}
+    df = df.rename(columns={k:v for k,v in rename_map.items() if k in df.columns})
+    
+    # Tạo cột khóa để merge
+    if crosswalk is not None and 'app_id_knn' in df.columns:
+        df['canonical_key'] = crosswalk.keys('knn', df['app_id_knn'], df.get('title_knn'))
+    elif 'title_knn' in df.columns:
+        df['normalized_title'] = df['title_knn'].apply(normalize_name)
+    return df
+
+def prepare_cb_recommendations(df, top_n=200, crosswalk=None):
+    """Chuẩn hóa kết quả CB (cột của cb_recommendations.csv) để ghép Hybrid"""
+    # CB Score là độ tương đồng (Score)
+    df = df.head(top_n).rename(columns={'Score': 'cb_score', 'AppID': 'app_id_cb', 'Name': 'title_cb'})
+    
+    # Tạo cột khóa để merge
+    if crosswalk is not None and 'app_id_cb' in df.columns:
+        df['canonical_key'] = crosswalk.keys('cb', df['app_id_cb'], df.get('title_cb'))
+    elif 'title_cb' in df.columns:
+        df['normalized_title'] = df['title_cb'].apply(normalize_name)
+    return df
+
+def read_knn_recommendations(knn_dir, top_n=200, crosswalk=None):
     try:
         path = os.path.join(knn_dir, "rcm_games.csv")
         if not os.path.exists(path): 
@@ -24,6 +67,7 @@ def read_knn_recommendations(knn_dir, top_n=200):
             return pd.DataFrame()
         
         df = pd.read_csv(path)
+        catalog = None
         
         # --- FIX LỖI THIẾU CỘT APP_ID ---
         if 'app_id' not in df.columns:
@@ -32,28 +76,14 @@ def read_knn_recommendations(knn_dir, top_n=200):
             
             if os.path.exists(games_path):
                 try:
-                    # Load file gốc để lấy ID
-                    games_df = pd.read_csv(games_path)
-                    # Tạo từ điển: Tên Game -> ID
-                    title_to_id = dict(zip(games_df['title'], games_df['app_id']))
-                    # Map vào dataframe hiện tại
-                    df['app_id'] = df['title'].map(title_to_id)
+                    # Catalog dùng chung (cache): hash map Tên Game -> ID
+                    catalog = load_game_catalog(knn_dir)
                 except Exception as e:
                     print(f"Failed to map App IDs: {e}")
-                    df['app_id'] = 0 # Fallback nếu lỗi
             else:
                 print("final_games.csv not found. Setting AppID to 0.")
-                df['app_id'] = 0
 
-        # Đổi tên cột chuẩn hóa
-        rename_map = {'relevance': 'knn_score', 'app_id': 'app_id_knn', 'title': 'title_knn'}
-        df = df.rename(columns={k:v for k,v in rename_map.items() if k in df.columns})
-        
-        # Tạo cột tên chuẩn hóa để merge
-        if 'title_knn' in df.columns:
-            df['normalized_title'] = df['title_knn'].apply(normalize_name)
-            
-        return df.head(top_n)
+        return prepare_knn_recommendations(df, catalog, top_n, crosswalk)
         
     except Exception as e:
         print(f"Error reading KNN: {e}")
@@ -61,37 +91,31 @@ def read_knn_recommendations(knn_dir, top_n=200):
         traceback.print_exc()
         return pd.DataFrame()
 
-def read_cb_recommendations(cb_dir, top_n=200):
+def read_cb_recommendations(cb_dir, top_n=200, crosswalk=None):
     try:
         path = os.path.join(cb_dir, "cb_recommendations.csv")
         if not os.path.exists(path): return pd.DataFrame()
         
-        df = pd.read_csv(path)
-        # CB Score là độ tương đồng (Score)
-        df = df.rename(columns={'Score': 'cb_score', 'AppID': 'app_id_cb', 'Name': 'title_cb'})
-        
-        # Tạo cột tên chuẩn hóa
-        if 'title_cb' in df.columns:
-            df['normalized_title'] = df['title_cb'].apply(normalize_name)
-        
-        return df.head(top_n)
+        return prepare_cb_recommendations(pd.read_csv(path), top_n, crosswalk)
     except Exception as e:
         print(f"Error reading CB: {e}")
         return pd.DataFrame()
 
-def calculate_hybrid_ranking(knn_dir, cb_dir, top_n=50, knn_weight=0.6, cb_weight=0.4):
-    print("Reading recommendations...")
-    
-    # 1. Đọc dữ liệu
-    knn_df = read_knn_recommendations(knn_dir, top_n=200)
-    cb_df = read_cb_recommendations(cb_dir, top_n=200)
-    
-    print(f"KNN Candidates: {len(knn_df)}")
-    print(f"CB Candidates: {len(cb_df)}")
-    
+def _column(frame, name, default=0):
+    """Cột name của frame, hoặc cột hằng default nếu không có"""
+    if name in frame.columns: return frame[name]
+    return pd.Series(default, index=frame.index)
+
+def align_recommendations(knn_df, cb_df):
+    """
+    Ghép kết quả KNN + CB (đã chuẩn hóa bằng prepare_knn_recommendations / prepare_cb_recommendations):
+    mỗi game 1 dòng với App Id, Title, điểm gốc (Knn Score, Cb Score) và điểm chuẩn hóa 0-1 (knn_norm, cb_norm).
+    """
     # Kiểm tra nếu dataframe rỗng
     if knn_df.empty and cb_df.empty:
         return pd.DataFrame()
+    knn_df = knn_df.copy()
+    cb_df = cb_df.copy()
 
     # 2. Chuẩn hóa điểm số (Normalize 0-1)
     if not knn_df.empty and 'knn_score' in knn_df.columns:
@@ -104,7 +128,7 @@ def calculate_hybrid_ranking(knn_dir, cb_dir, top_n=50, knn_weight=0.6, cb_weigh
         if cb_max > 0: cb_df['cb_norm'] = cb_df['cb_score'] / cb_max
         else: cb_df['cb_norm'] = 0
 
-    # 3. MERGE DỮ LIỆU (Full Outer Join theo Tên)
+    # 3. MERGE DỮ LIỆU (Full Outer Join theo mã crosswalk - số nguyên, không có thì theo Tên)
     # Nếu một trong 2 bên rỗng, trả về bên kia
     if knn_df.empty:
         merged = cb_df
@@ -121,58 +145,130 @@ def calculate_hybrid_ranking(knn_dir, cb_dir, top_n=50, knn_weight=0.6, cb_weigh
         merged['app_id_cb'] = merged['app_id_knn']
     else:
         # Merge thật
-        merged = pd.merge(knn_df, cb_df, on='normalized_title', how='outer', suffixes=('_k', '_c'))
-    
-    final_results = []
-    
-    for _, row in merged.iterrows():
-        # Xử lý Title (Lấy cái nào không NaN)
-        title = row.get('title_knn', '')
-        if pd.isna(title) or title == '': title = row.get('title_cb', 'Unknown')
-            
-        # Xử lý AppID (Ưu tiên CB vì ID chuẩn)
-        app_id_cb = row.get('app_id_cb', float('nan'))
-        app_id_knn = row.get('app_id_knn', float('nan'))
-        
-        # Logic lấy ID an toàn:
-        if pd.notna(app_id_cb) and app_id_cb != 0:
-            app_id = app_id_cb
-        elif pd.notna(app_id_knn):
-            app_id = app_id_knn
-        else:
-            app_id = 0
-            
-        # Lấy điểm
-        k_norm = row.get('knn_norm', 0) if pd.notna(row.get('knn_norm', 0)) else 0
-        c_norm = row.get('cb_norm', 0) if pd.notna(row.get('cb_norm', 0)) else 0
-        
-        k_raw = row.get('knn_score', 0) if pd.notna(row.get('knn_score', 0)) else 0
-        c_raw = row.get('cb_score', 0) if pd.notna(row.get('cb_score', 0)) else 0
-        
-        # --- CÔNG THỨC TÍNH ĐIỂM ---
-        base_score = (k_norm * knn_weight) + (c_norm * cb_weight)
-        
-        # Synergy Boost: Nếu có cả 2 điểm -> Bonus
-        if k_norm > 0 and c_norm > 0:
-            boost = (k_norm * c_norm) ** 0.5
-            final_score = base_score + (boost * 0.5)
-        else:
-            final_score = base_score * 0.8
-            
-        final_results.append({
-            'App Id': int(app_id),
-            'Title': title,
-            'Hybrid Score': round(final_score * 10, 2),
-            'Knn Score': round(k_raw, 2),
-            'Cb Score': round(c_raw, 2)
-        })
-    
+        key = 'canonical_key' if 'canonical_key' in knn_df.columns and 'canonical_key' in cb_df.columns else 'normalized_title'
+        merged = pd.merge(knn_df, cb_df, on=key, how='outer', suffixes=('_k', '_c'))
+
+    # Title: lấy của KNN, thiếu (NaN / rỗng) thì lấy của CB
+    title = _column(merged, 'title_knn', '')
+    title = title.where(title.notna() & (title != ''), _column(merged, 'title_cb', 'Unknown'))
+
+    # AppID: ưu tiên CB (ID chuẩn, khác 0), sau đó tới KNN, không có thì 0
+    app_id_cb = _column(merged, 'app_id_cb', np.nan)
+    app_id = app_id_cb.where(app_id_cb != 0).combine_first(_column(merged, 'app_id_knn', np.nan)).fillna(0)
+
+    # Lấy điểm (NaN -> 0)
+    return pd.DataFrame({
+        'App Id': app_id.astype(np.int64),
+        'Title': title,
+        'knn_norm': _column(merged, 'knn_norm').fillna(0).astype(np.float64),
+        'cb_norm': _column(merged, 'cb_norm').fillna(0).astype(np.float64),
+        'Knn Score': _column(merged, 'knn_score').fillna(0).astype(np.float64),
+        'Cb Score': _column(merged, 'cb_score').fillna(0).astype(np.float64)
+    }, index=merged.index)
+
+def hybrid_scores(k_norm, c_norm, knn_weight, cb_weight, boost=SYNERGY_BOOST, penalty=SINGLE_SOURCE_PENALTY):
+    """
+    --- CÔNG THỨC TÍNH ĐIỂM --- (0-10, chưa làm tròn)
+    Tham số có thể là mảng cột (S x 1) -> tính S kịch bản cùng lúc (broadcast), kết quả S x N.
+    """
+    base_score = (k_norm * knn_weight) + (c_norm * cb_weight)
+    # Synergy Boost: Nếu có cả 2 điểm -> Bonus, chỉ có 1 bên -> phạt (x penalty)
+    final_score = np.where((k_norm > 0) & (c_norm > 0), base_score + ((k_norm * c_norm) ** 0.5) * boost, base_score * penalty)
+    return final_score * 10
+
+def _round_scores(values):
+    """Làm tròn sau khi chọn top: round() của Python làm tròn theo giá trị thập phân thật
+    (np.round lệch 0.01 ở một số số như 0.855)"""
+    return [round(v, 2) for v in values.tolist()]
+
+def fuse_recommendations(knn_df, cb_df, top_n=50, knn_weight=0.6, cb_weight=0.4,
+                         boost=SYNERGY_BOOST, penalty=SINGLE_SOURCE_PENALTY):
+    """
+    Ghép kết quả KNN + CB và tính điểm hybrid bằng phép toán trên cả cột (không duyệt từng dòng).
+    """
+    aligned = align_recommendations(knn_df, cb_df)
+    if aligned.empty:
+        return pd.DataFrame()
+
     # 4. Tạo bảng kết quả
-    hybrid_df = pd.DataFrame(final_results)
-    hybrid_df = hybrid_df.sort_values('Hybrid Score', ascending=False).head(top_n)
+    hybrid_df = pd.DataFrame({
+        'App Id': aligned['App Id'],
+        'Title': aligned['Title'],
+        'Hybrid Score': hybrid_scores(aligned['knn_norm'].to_numpy(), aligned['cb_norm'].to_numpy(),
+                                      knn_weight, cb_weight, boost, penalty),
+        'Knn Score': aligned['Knn Score'],
+        'Cb Score': aligned['Cb Score']
+    })
+    # Chỉ giữ top_n (không sort cả bảng). Xếp hạng theo điểm CHƯA làm tròn: game bằng điểm sau khi
+    # làm tròn có thể đổi thứ tự (và vài game ở ranh giới top_n có thể khác) so với bản cũ
+    # sort_values trên điểm đã làm tròn. Bản cũ dùng sort không ổn định nên thứ tự đó vốn tùy ý,
+    # đây không phải lỗi; sweep_recommendations xếp hạng y hệt hàm này.
+    hybrid_df = hybrid_df.nlargest(top_n, 'Hybrid Score')
+    for col in ['Hybrid Score', 'Knn Score', 'Cb Score']:
+        hybrid_df[col] = _round_scores(hybrid_df[col])
     
     # Reset Rank
     hybrid_df.insert(0, 'Rank', range(1, len(hybrid_df) + 1))
+    return hybrid_df
+
+def weight_grid(knn_weights, cb_weights, boosts=(SYNERGY_BOOST,), penalties=(SINGLE_SOURCE_PENALTY,)):
+    """Mọi tổ hợp (knn_weight, cb_weight, boost, penalty) -> DataFrame kịch bản cho sweep_recommendations"""
+    grid = pd.MultiIndex.from_product([knn_weights, cb_weights, boosts, penalties],
+                                      names=['knn_weight', 'cb_weight', 'boost', 'penalty'])
+    return grid.to_frame(index=False)
+
+def sweep_recommendations(knn_df, cb_df, scenarios, top_n=10):
+    """
+    Top-n hybrid cho nhiều kịch bản trọng số cùng lúc: ghép 2 bên 1 lần, sau đó tính điểm
+    mọi kịch bản bằng 1 phép broadcast numpy (S kịch bản x N game).
+    scenarios: DataFrame (vd. weight_grid) với cột knn_weight, cb_weight và tùy chọn boost, penalty.
+    Trả về bảng dài: Scenario (nhãn dòng của scenarios), Rank, App Id, Title, Hybrid Score, Knn Score, Cb Score;
+    mỗi kịch bản giống hệt fuse_recommendations với cùng tham số.
+    """
+    columns = ['Scenario', 'Rank', 'App Id', 'Title', 'Hybrid Score', 'Knn Score', 'Cb Score']
+    aligned = align_recommendations(knn_df, cb_df)
+    if aligned.empty or len(scenarios) == 0:
+        return pd.DataFrame(columns=columns)
+
+    def param(name, default):
+        values = scenarios[name] if name in scenarios.columns else pd.Series(default, index=scenarios.index)
+        return values.to_numpy(dtype=np.float64)[:, None]
+
+    scores = hybrid_scores(
+        aligned['knn_norm'].to_numpy()[None, :], aligned['cb_norm'].to_numpy()[None, :],
+        param('knn_weight', 0.6), param('cb_weight', 0.4),
+        param('boost', SYNERGY_BOOST), param('penalty', SINGLE_SOURCE_PENALTY)
+    )
+    # Top-n mỗi kịch bản; sort ổn định -> game bằng điểm giữ thứ tự như nlargest của fuse_recommendations
+    top_n = min(top_n, scores.shape[1])
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :top_n]
+
+    rows = order.ravel()
+    return pd.DataFrame({
+        'Scenario': np.repeat(scenarios.index.to_numpy(), top_n),
+        'Rank': np.tile(np.arange(1, top_n + 1), len(scenarios)),
+        'App Id': aligned['App Id'].to_numpy()[rows],
+        'Title': aligned['Title'].to_numpy()[rows],
+        'Hybrid Score': _round_scores(np.take_along_axis(scores, order, axis=1).ravel()),
+        # Điểm gốc không phụ thuộc kịch bản: làm tròn 1 lần cho mỗi game
+        'Knn Score': np.array(_round_scores(aligned['Knn Score']))[rows],
+        'Cb Score': np.array(_round_scores(aligned['Cb Score']))[rows]
+    }, columns=columns)
+
+def calculate_hybrid_ranking(knn_dir, cb_dir, top_n=50, knn_weight=0.6, cb_weight=0.4):
+    print("Reading recommendations...")
+    
+    # 1. Đọc dữ liệu (bảng đối chiếu ID KNN <-> CB build sẵn, None nếu thiếu CB_games.csv)
+    crosswalk = load_game_crosswalk(knn_dir, cb_dir)
+    knn_df = read_knn_recommendations(knn_dir, top_n=200, crosswalk=crosswalk)
+    cb_df = read_cb_recommendations(cb_dir, top_n=200, crosswalk=crosswalk)
+    
+    print(f"KNN Candidates: {len(knn_df)}")
+    print(f"CB Candidates: {len(cb_df)}")
+
+    hybrid_df = fuse_recommendations(knn_df, cb_df, top_n, knn_weight, cb_weight)
+    if hybrid_df.empty:
+        return hybrid_df
     
     # Debug info
     overlap = len(hybrid_df[ (hybrid_df['Knn Score'] > 0) & (hybrid_df['Cb Score'] > 0) ])
@@ -180,6 +276,13 @@ def calculate_hybrid_ranking(knn_dir, cb_dir, top_n=50, knn_weight=0.6, cb_weigh
     
     return hybrid_df
 
+def sweep_hybrid_ranking(knn_dir, cb_dir, scenarios, top_n=10):
+    """Như calculate_hybrid_ranking cho nhiều kịch bản (xem sweep_recommendations): chỉ đọc / ghép 2 file 1 lần"""
+    crosswalk = load_game_crosswalk(knn_dir, cb_dir)
+    knn_df = read_knn_recommendations(knn_dir, top_n=200, crosswalk=crosswalk)
+    cb_df = read_cb_recommendations(cb_dir, top_n=200, crosswalk=crosswalk)
+    return sweep_recommendations(knn_df, cb_df, scenarios, top_n)
+
 def save_hybrid_ranking(df, path):
     try:
         df.to_csv(path, index=False)
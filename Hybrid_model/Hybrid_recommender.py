@@ -0,0 +1,117 @@
+"""
+Hybrid Recommender (in-process)
+Gọi thẳng 2 engine con thay vì đọc lại file kết quả của chúng:
+- KNN: KNNRecommender (review store + catalog giữ trong RAM)
+- CB:  CBSession (catalog + model đã train giữ trong RAM)
+Mỗi lần recommend(profile): 2 model chấm điểm song song (thread pool, phần nặng là numpy / scipy
+nên nhả GIL), kết quả ghép ngay trong bộ nhớ bằng fuse_recommendations
+(join số nguyên theo bảng đối chiếu ID Game_crosswalk).
+Ghi rcm_games.csv / cb_recommendations.csv chỉ khi persist=True (để Hybrid_results_viewer, test_scripts dùng lại).
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from Hybrid_recommendations_reader import prepare_knn_recommendations, prepare_cb_recommendations, fuse_recommendations
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, "KNN_model"))
+sys.path.append(os.path.join(project_root, "CB_model"))
+from KNN_Core import KNNRecommender, load_user_profile
+from Game_crosswalk import load_game_crosswalk
+from ContentBased_commands import get_session
+
+# --- CẤU HÌNH ---
+CANDIDATES = 200                  # Số ứng viên lấy từ mỗi model (giống read_*_recommendations)
+CB_PREFS = {'max_price': 100}     # Giống nút Get Recommendations của CB
+
+
+class HybridRecommender:
+    def __init__(self, knn_dir, cb_dir, knn_weight=0.5, cb_weight=0.5, candidates=CANDIDATES, knn_engine=None):
+        self.knn_dir = knn_dir
+        self.cb_dir = cb_dir
+        self.knn_weight = knn_weight
+        self.cb_weight = cb_weight
+        self.candidates = candidates
+        self.knn_engine = knn_engine or KNNRecommender(knn_dir)
+        self.cb_session = get_session(cb_dir)
+        self.crosswalk = None
+        self._pool = ThreadPoolExecutor(max_workers=2)
+
+    def close(self):
+        """Dừng thread pool (gọi khi không dùng recommender nữa, hoặc dùng with HybridRecommender(...) as hybrid)"""
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def load(self):
+        """Load dữ liệu 2 model song song (chỉ lần đầu, sau đó dùng lại bản trong RAM)"""
+        knn_future = self._pool.submit(self.knn_engine.load_data)
+        cb_future = self._pool.submit(self.cb_session.model)
+        self.crosswalk = load_game_crosswalk(self.knn_dir, self.cb_dir)
+        return knn_future.result(), cb_future.result() is not None
+
+    def load_profile(self):
+        """
+        Profile đã lưu của user:
+        your_games / fav_games (KNN, your_games.csv + fav_games.csv), rated_games {AppID: rating} (CB, cb_user_ratings.json)
+        """
+        your_games, fav_games = load_user_profile(self.knn_dir)
+        return {'your_games': your_games, 'fav_games': fav_games, 'rated_games': self.cb_session.rated_games()}
+
+    def _knn_candidates(self, profile, persist):
+        your_games = profile.get('your_games')
+        if your_games is None or your_games.empty:
+            return pd.DataFrame()
+        fav_games = profile.get('fav_games')
+        if fav_games is None:
+            fav_games = pd.DataFrame(columns=['gameID'])
+        rcm, rcm_wish = self.knn_engine.recommend(your_games, fav_games)
+        if persist:
+            self.knn_engine.save_recommendations(rcm, rcm_wish)
+        # Kết quả trong RAM đã có app_id -> ghép thẳng theo ID (chỉ rcm_games.csv cũ mới phải tìm lại theo tên)
+        return prepare_knn_recommendations(rcm, top_n=self.candidates, crosswalk=self.crosswalk)
+
+    def _cb_candidates(self, profile, persist):
+        rated_games = profile.get('rated_games')
+        if not rated_games:
+            return pd.DataFrame()
+        recommender = self.cb_session.model()
+        catalog = self.cb_session.catalog()
+        if recommender is None or catalog is None:
+            print("Content-Based model is not trained. Using KNN only.")
+            return pd.DataFrame()
+        recs = recommender.get_recommendations(catalog, rated_games, CB_PREFS, top_n=self.candidates)
+        if persist and not recs.empty:
+            self.cb_session.export(recs)
+        return prepare_cb_recommendations(recs, self.candidates, self.crosswalk)
+
+    def recommend(self, profile=None, top_n=50, persist=False):
+        """
+        Hybrid ranking cho 1 profile (dict như load_profile; None -> profile đã lưu).
+        persist: ghi thêm kết quả của 2 model con ra CSV như khi chạy riêng từng model.
+        """
+        if profile is None:
+            profile = self.load_profile()
+        # Bảng đối chiếu giữ trong RAM, chỉ đọc / build lại khi final_games.csv hoặc CB_games.csv đổi
+        self.crosswalk = load_game_crosswalk(self.knn_dir, self.cb_dir)
+
+        start = time.time()
+        knn_future = self._pool.submit(self._knn_candidates, profile, persist)
+        cb_future = self._pool.submit(self._cb_candidates, profile, persist)
+        knn_df, cb_df = knn_future.result(), cb_future.result()
+        print(f"KNN Candidates: {len(knn_df)}")
+        print(f"CB Candidates: {len(cb_df)}")
+
+        hybrid_df = fuse_recommendations(knn_df, cb_df, top_n, self.knn_weight, self.cb_weight)
+        print(f"Hybrid recommendations: {len(hybrid_df)} games in {time.time() - start:.3f}s")
+        if persist:
+            self.cb_session.flush()
+        return hybrid_df
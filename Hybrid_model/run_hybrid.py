@@ -1,13 +1,13 @@
 """
 Hybrid Recommendation System - Standalone Script
-Đọc recommendations từ KNN và Content-Based models đã chạy và tính hybrid ranking
+Chạy KNN và Content-Based models trong process và tính hybrid ranking
 """
 
 import os
 import sys
 import tkinter as tk
-# Import hàm save và calculate từ file reader (đảm bảo bạn đã sửa file này như bài trước)
-from Hybrid_recommendations_reader import calculate_hybrid_ranking, save_hybrid_ranking
+from Hybrid_recommendations_reader import save_hybrid_ranking
+from Hybrid_recommender import HybridRecommender
 from Hybrid_results_viewer import show_hybrid_results
 
 # Get paths
@@ -26,46 +26,26 @@ print(f"Output directory: {hybrid_dir}")
 print("="*80)
 print()
 
-# Kiểm tra recommendations files
-knn_recommendations = os.path.join(knn_dir, "rcm_games.csv")
-if not os.path.exists(knn_recommendations):
-    knn_recommendations = os.path.join(knn_dir, "recommendations.csv")
+# KNN và CB chạy trực tiếp trong process, song song trên cùng profile (không đọc lại CSV trung gian)
+with HybridRecommender(knn_dir, cb_dir, knn_weight=0.5, cb_weight=0.5) as hybrid:
+    profile = hybrid.load_profile()
 
-cb_recommendations = os.path.join(cb_dir, "cb_recommendations.csv")
+    print("Checking user data...")
+    if profile['your_games'].empty:
+        print("⚠️ WARNING: No KNN games found (your_games.csv). Please save your data in the KNN UI.")
+    if not profile['rated_games']:
+        print("⚠️ WARNING: No Content-Based ratings found (cb_user_ratings.json). Please save ratings in the CB UI.")
 
-print("Checking recommendations files...")
-if not os.path.exists(knn_recommendations):
-    print(f"❌ ERROR: KNN recommendations not found!")
-    print(f"   Expected: {knn_recommendations}")
-    print(f"   Please run KNN model first and get recommendations.")
-    sys.exit(1)
-else:
-    print(f"✅ Found KNN recommendations: {knn_recommendations}")
-
-if not os.path.exists(cb_recommendations):
-    print(f"❌ ERROR: Content-Based recommendations not found!")
-    print(f"   Expected: {cb_recommendations}")
-    print(f"   Please run Content-Based model first and get recommendations.")
-    sys.exit(1)
-else:
-    print(f"✅ Found CB recommendations: {cb_recommendations}")
-
-print()
-print("Calculating hybrid rankings...")
-print("-"*80)
+    print()
+    print("Calculating hybrid rankings...")
+    print("-"*80)
 
-# Tính hybrid ranking
-hybrid_ranking = calculate_hybrid_ranking(
-    knn_dir=knn_dir,
-    cb_dir=cb_dir,
-    top_n=50,
-    knn_weight=0.5,
-    cb_weight=0.5
-)
+    # Tính hybrid ranking (vẫn ghi rcm_games.csv / cb_recommendations.csv cho test_scripts)
+    hybrid_ranking = hybrid.recommend(profile, top_n=50, persist=True)
 
 if hybrid_ranking.empty:
     print("❌ ERROR: No hybrid rankings calculated!")
-    print("   Make sure both KNN and CB recommendations contain valid data.")
+    print("   Make sure KNN data is saved and the CB model is trained with some ratings.")
     sys.exit(1)
 
 # Lưu kết quả
@@ -1,10 +1,20 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, scrolledtext
 import re
 import pandas as pd
 import os
-import nbformat
-from nbconvert.preprocessors import ExecutePreprocessor
+import time
+from KNN_Core import KNNRecommender, load_user_profile, RESULT_COLUMNS
+
+# Engine KNN dùng chung cho cả phiên UI (dữ liệu chỉ load 1 lần)
+KNN_MODE = 'user'  # 'user': User-Based KNN ; 'item': bảng Item-Item tính sẵn (nhanh, không phụ thuộc số user)
+_knn_engine = None
+
+def get_engine(dir_path):
+    global _knn_engine
+    if _knn_engine is None or _knn_engine.dir_path != dir_path:
+        _knn_engine = KNNRecommender(dir_path, mode=KNN_MODE)
+    return _knn_engine
 
 def update_search(search_frame, games_dict, list_frame):
     games_listbox = None
@@ -106,7 +116,7 @@ def clear_all_favourites(fav_games_listbox, fav_games_dict):
         fav_games_dict.clear()
         fav_games_listbox.delete(0, tk.END)
 
-def confirm(played_games_dict, fav_games_dict, df_all, dir_path):
+def confirm(played_games_dict, fav_games_dict, catalog, dir_path):
     try:
         played_data = []
         review_numerical_value = {'Like': 1, 'Interested': 0.5, 'Neutral/Not Interested': -0.5, 'Dislike': -1}
@@ -117,10 +127,9 @@ def confirm(played_games_dict, fav_games_dict, df_all, dir_path):
                 review_text = gameReview.split('Review: ')[1]
                 review_val = review_numerical_value.get(review_text, 0)
                 
-                # Find ID
-                game_row = df_all[df_all['title'] == gameName]
-                if not game_row.empty:
-                    game_id = game_row['app_id'].values[0]
+                # Find ID (tra hash map tên -> app_id của catalog)
+                game_id = catalog.app_id_of_title(gameName)
+                if game_id is not None:
                     played_data.append({'gameID': game_id, 'gameName': gameName, 'review': review_val})
             except Exception as e:
                 print(f"Error processing {gameName}: {e}")
@@ -131,9 +140,8 @@ def confirm(played_games_dict, fav_games_dict, df_all, dir_path):
 
         fav_data = []
         for gameName in fav_games_dict.keys():
-            game_row = df_all[df_all['title'] == gameName]
-            if not game_row.empty:
-                game_id = game_row['app_id'].values[0]
+            game_id = catalog.app_id_of_title(gameName)
+            if game_id is not None:
                 fav_data.append({'gameID': game_id, 'gameName': gameName})
         
         # Fix lỗi EmptyDataError bằng cách luôn tạo DataFrame có cột
@@ -144,20 +152,55 @@ def confirm(played_games_dict, fav_games_dict, df_all, dir_path):
     except Exception as e:
         messagebox.showerror('Error', f"Failed to save data: {e}")
 
+def format_dataframe(dataframe):
+    # Define column widths
+    col_widths = {
+        'Rank': 10,
+        'sort_rank': 10,
+        'title': 60,
+        'date_release': 20,
+        'relevance': 20,
+        'positive_ratio': 20,
+        'user_reviews': 10
+    }
+    header = "".join([f"{col:{col_widths.get(col, 20)}}" for col in dataframe.columns]) + "\n"
+    rows = "\n".join(
+        "".join([f"{str(value):{col_widths.get(col, 20)}}" for col, value in row.items()])
+        for _, row in dataframe.iterrows()
+    )
+    return header + rows
+
+def show_recommendations(recommendation, title):
+    recommendation = recommendation[RESULT_COLUMNS].copy()
+    recommendation.insert(0, 'Rank', range(1, len(recommendation) + 1))
+
+    window = tk.Toplevel()
+    window.title(title)
+    txt = scrolledtext.ScrolledText(window, width=100, height=20, wrap=tk.NONE, font=("Courier", 10))
+    txt.pack(expand=True, fill=tk.BOTH)
+    txt.insert(tk.END, format_dataframe(recommendation))
+    txt.configure(state='disabled')
+
 def get_recommendations(dir_path):
     try:
-        notebook_path = os.path.join(dir_path, "knn_model.ipynb")
-        if not os.path.exists(notebook_path):
-            messagebox.showerror("Error", "knn_model.ipynb not found!")
+        start = time.time()
+        your_games, fav_games = load_user_profile(dir_path)
+        if your_games.empty:
+            messagebox.showwarning("Warning", "Please add reviews and click 'Save Your Data' first!")
             return
 
-        with open(notebook_path, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
+        engine = get_engine(dir_path)
+        if not engine.load_data():
+            messagebox.showerror("Error", "final_reviews.csv / final_games.csv not found!")
+            return
 
-        ep = ExecutePreprocessor(timeout=6000, kernel_name='python3')
-        ep.preprocess(nb, {'metadata': {'path': dir_path}})
+        recommendation, recommendation_wish = engine.recommend(your_games, fav_games)
+        engine.save_recommendations(recommendation, recommendation_wish)
 
-        messagebox.showinfo('Success', 'Recommendations generated successfully.\nCheck rcm_games.csv')
+        elapsed = time.time() - start
+        show_recommendations(recommendation, f'Recommended Games ({elapsed:.1f}s)')
+        if not recommendation_wish.empty:
+            show_recommendations(recommendation_wish, f'Recommended Wishlist Games ({elapsed:.1f}s)')
 
     except Exception as e:
-        messagebox.showerror('Error', f'Failed to run recommendations: {str(e)}')
\ No newline at end of file
+        messagebox.showerror('Error', f'Failed to run recommendations: {str(e)}')
@@ -1,4 +1,6 @@
+import os
 import pandas as pd
+from Game_catalog import load_game_catalog
 
 # Function to load CSV file and handle errors
 def load_csv(file_path):
@@ -11,10 +13,13 @@ def load_csv(file_path):
     
 
 def load_data(file_path, type):
-    df = load_csv(file_path)
     games_dict = {}
     if type == "all":
-        if df is None:
+        # Danh mục game dùng chung (cache) -> engine KNN / nút Save không phải đọc lại CSV
+        try:
+            df = load_game_catalog(os.path.dirname(file_path), os.path.basename(file_path)).frame
+        except FileNotFoundError:
+            print('Notification', f'File {file_path} not found.')
             exit()
         for idx, row in df.iterrows():
             game_name = row['title']
@@ -22,6 +27,7 @@ def load_data(file_path, type):
             games_dict[game_name] = game_info
 
     elif type == "played":
+        df = load_csv(file_path)
         if df is None:
             df = pd.DataFrame(columns=['gameID', 'gameName', 'review'])
         for idx, row in df.iterrows():
@@ -31,6 +37,7 @@ def load_data(file_path, type):
             games_dict[game_name] = game_info
 
     elif type == "fav":
+        df = load_csv(file_path)
         if df is None:
             df = pd.DataFrame(columns=['gameID', 'gameName'])
         for idx, row in df.iterrows():
@@ -0,0 +1,176 @@
+"""
+Data Preprocessing (streaming) - Bản script của data_preprocessing_1.ipynb
+Tạo final_reviews.csv + final_games.csv từ dataset Kaggle (recommendations.csv ~41M dòng, games.csv)
+mà không cần load toàn bộ recommendations.csv vào RAM:
+1. games.csv -> whitelist game (Windows, >= 100 reviews, xếp hạng sort_value) giống notebook
+2. recommendations.csv đọc theo chunk (chỉ 3 cột, dtype gọn), lọc theo whitelist ngay trong chunk
+3. Bỏ dòng trùng: mỗi dòng mã hóa thành 1 khóa int64 (user, app, is_recommended);
+   khóa đã gặp được giữ trong các mảng đã sắp xếp (sort-merge) -> 8 byte / review thay vì cả DataFrame
+4. Ghi nối tiếp (append) từng chunk ra final_reviews.csv; final_games.csv chỉ giữ game có review
+Thứ tự dòng và kết quả giống hệt notebook (drop_duplicates giữ dòng xuất hiện đầu tiên).
+
+Chạy:
+    python Data_preprocessing.py [thư mục chứa recommendations.csv, games.csv] [--store]
+    --store: build luôn review store binary (Review_store.py) từ final_reviews.csv
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 2_000_000
+MIN_USER_REVIEWS = 100
+MAX_SEEN_RUNS = 8       # Số mảng khóa đã sắp xếp tối đa trước khi gộp lại thành 1
+APP_BITS = 24           # app_id < 2^24 ; khóa = ((user_id << APP_BITS) | app_id) << 1 | is_recommended
+
+REVIEW_COLUMNS = ['app_id', 'is_recommended', 'user_id']
+GAME_COLUMNS = ['app_id', 'title', 'date_release', 'win', 'positive_ratio', 'user_reviews']
+
+
+class StageTimer:
+    """Cộng dồn thời gian + số dòng của từng bước, in bảng báo cáo ở cuối"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds, rows=0):
+        total_seconds, total_rows = self.stages.get(name, (0.0, 0))
+        self.stages[name] = (total_seconds + seconds, total_rows + rows)
+
+    def report(self):
+        print("-" * 60)
+        print(f"{'Stage':<28} | {'Time (s)':>10} | {'Rows':>14}")
+        print("-" * 60)
+        for name, (seconds, rows) in self.stages.items():
+            print(f"{name:<28} | {seconds:>10.2f} | {rows:>14,}")
+        print("-" * 60)
+        print(f"{'Total':<28} | {sum(s for s, _ in self.stages.values()):>10.2f} |")
+
+
+class SeenKeys:
+    """Tập khóa đã gặp, lưu thành vài mảng int64 đã sắp xếp (tra bằng searchsorted)"""
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, keys):
+        found = np.zeros(len(keys), dtype=bool)
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            found |= run[pos] == keys
+        return found
+
+    def add(self, sorted_keys):
+        if len(sorted_keys) == 0:
+            return
+        self.runs.append(sorted_keys)
+        if len(self.runs) > MAX_SEEN_RUNS:
+            merged = np.concatenate(self.runs)
+            merged.sort(kind='mergesort')
+            self.runs = [merged]
+
+
+def build_game_whitelist(games_path):
+    """Các bước xử lý games.csv của notebook (trước khi giao với reviews)"""
+    games = pd.read_csv(games_path, usecols=GAME_COLUMNS)
+    games = games[games['win']].drop(columns=['win'])
+    games['sort_value'] = (games['positive_ratio'] / 100) ** 10 * games['user_reviews']
+    games = games.sort_values(by='sort_value', ascending=False)
+    games = games[games["user_reviews"] >= MIN_USER_REVIEWS]
+    games.insert(0, 'sort_rank', range(1, len(games) + 1))
+    return games
+
+
+def review_keys(app_id, is_recommended, user_id):
+    if len(app_id) and (app_id.max() >= (1 << APP_BITS) or app_id.min() < 0):
+        raise ValueError(f"app_id out of range for {APP_BITS}-bit key")
+    return ((user_id << APP_BITS) | app_id) << 1 | is_recommended.astype(np.int64)
+
+
+def stream_reviews(reviews_path, output_path, whitelist, timer, chunk_size=CHUNK_SIZE):
+    """Đọc - lọc - bỏ trùng - ghi theo từng chunk. Trả về các app_id có ít nhất 1 review"""
+    whitelist = np.sort(np.asarray(whitelist, dtype=np.int64))
+    seen = SeenKeys()
+    used_apps = np.zeros(len(whitelist), dtype=bool)
+    header = True
+
+    reader = pd.read_csv(
+        reviews_path,
+        usecols=REVIEW_COLUMNS,
+        dtype={'app_id': np.int64, 'user_id': np.int64, 'is_recommended': bool},
+        chunksize=chunk_size
+    )
+    while True:
+        start = time.perf_counter()
+        chunk = next(reader, None)
+        if chunk is None:
+            break
+        chunk = chunk[REVIEW_COLUMNS]
+        timer.add("read (chunked)", time.perf_counter() - start, len(chunk))
+
+        start = time.perf_counter()
+        app_id = chunk['app_id'].to_numpy()
+        pos = np.minimum(np.searchsorted(whitelist, app_id), max(len(whitelist) - 1, 0))
+        keep = (whitelist[pos] == app_id) if len(whitelist) else np.zeros(len(chunk), dtype=bool)
+        chunk = chunk[keep]
+        used_apps[pos[keep]] = True
+        timer.add("filter (whitelist)", time.perf_counter() - start, len(chunk))
+
+        start = time.perf_counter()
+        keys = review_keys(chunk['app_id'].to_numpy(), chunk['is_recommended'].to_numpy(), chunk['user_id'].to_numpy())
+        # Trùng trong chunk: giữ lần xuất hiện đầu ; trùng với chunk trước: tra trong seen
+        unique_keys, first = np.unique(keys, return_index=True)
+        new = ~seen.contains(unique_keys)
+        first = np.sort(first[new])
+        seen.add(unique_keys[new])
+        chunk = chunk.iloc[first]
+        timer.add("dedupe (sort-merge)", time.perf_counter() - start, len(chunk))
+
+        start = time.perf_counter()
+        chunk.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        timer.add("write (append)", time.perf_counter() - start, len(chunk))
+
+    if header:  # Không có dòng nào -> vẫn ghi header
+        pd.DataFrame(columns=REVIEW_COLUMNS).to_csv(output_path, index=False)
+    return whitelist[used_apps]
+
+
+def preprocess(raw_dir, out_dir=None, chunk_size=CHUNK_SIZE):
+    out_dir = out_dir or raw_dir
+    reviews_path = os.path.join(raw_dir, "recommendations.csv")
+    games_path = os.path.join(raw_dir, "games.csv")
+    for path in (reviews_path, games_path):
+        if not os.path.exists(path):
+            print(f"File {path} not found.")
+            return False
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    games = build_game_whitelist(games_path)
+    timer.add("games whitelist", time.perf_counter() - start, len(games))
+
+    common_app_ids = stream_reviews(
+        reviews_path, os.path.join(out_dir, "final_reviews.csv"), games['app_id'], timer, chunk_size
+    )
+
+    start = time.perf_counter()
+    games = games[games['app_id'].isin(common_app_ids)]
+    games.to_csv(os.path.join(out_dir, "final_games.csv"), index=False)
+    timer.add("final games", time.perf_counter() - start, len(games))
+
+    timer.report()
+    return True
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    data_dir = args[0] if args else os.path.dirname(os.path.abspath(__file__))
+    if preprocess(data_dir) and "--store" in sys.argv:
+        from Review_store import build_review_store, STORE_DIR_NAME
+        build_review_store(os.path.join(data_dir, "final_reviews.csv"), os.path.join(data_dir, STORE_DIR_NAME))
@@ -0,0 +1,66 @@
+"""
+Evaluation Metrics - Confusion matrix (TP / FP / TN / FN), Accuracy, Precision, Recall
+Tính bằng mask boolean trên mảng numpy thay vì duyệt từng game:
+- recommended: mask bool (n_games,) hoặc (n_users x n_games)
+- actual: giá trị thật trên cùng không gian game (> 0 = thích, < 0 = không thích, 0 = chưa biết)
+Mọi hàm đều nhận cả 1 user (1 chiều) lẫn 1 batch user (2 chiều, mỗi dòng 1 user).
+Dùng chung cho knn_model.ipynb, test_scripts/test_knn_model.py và test_scripts/test_hybrid_model.py.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def ids_to_mask(id_lists, id_space):
+    """
+    Danh sách id của từng user -> mask bool (n_users x len(id_space)).
+    id_space: các id không trùng nhau (vd. games_id_reviews). Id không có trong id_space bị bỏ qua.
+    """
+    index = pd.Index(id_space)
+    id_lists = [list(ids) for ids in id_lists]
+    rows = np.repeat(np.arange(len(id_lists)), [len(ids) for ids in id_lists])
+    cols = index.get_indexer([game_id for ids in id_lists for game_id in ids])
+    mask = np.zeros((len(id_lists), len(index)), dtype=bool)
+    found = cols >= 0
+    mask[rows[found], cols[found]] = True
+    return mask
+
+
+def confusion_counts(recommended, actual, unknown_as_negative=False):
+    """
+    Đếm TP / FP / TN / FN trên trục cuối.
+    unknown_as_negative=False: chỉ game có đánh giá (actual != 0) được tính (giống getMesure trong notebook).
+    unknown_as_negative=True: game không thuộc tập đúng đều là negative (Precision@K / Recall@K).
+    """
+    recommended = np.asarray(recommended, dtype=bool)
+    actual = np.asarray(actual)
+    positive = actual > 0
+    negative = actual <= 0 if unknown_as_negative else actual < 0
+    return {
+        'tp': np.count_nonzero(recommended & positive, axis=-1),
+        'fp': np.count_nonzero(recommended & negative, axis=-1),
+        'tn': np.count_nonzero(~recommended & negative, axis=-1),
+        'fn': np.count_nonzero(~recommended & positive, axis=-1),
+    }
+
+
+def confusion_scores(counts, empty=None):
+    """
+    (accuracy, precision, recall) theo %, từ kết quả của confusion_counts.
+    empty: giá trị khi mẫu số bằng 0 (None = dùng accuracy như getMesure cũ).
+    """
+    tp, fp, tn, fn = (np.asarray(counts[key], dtype=np.float64) for key in ('tp', 'fp', 'tn', 'fn'))
+    total = tp + fp + tn + fn
+    accuracy = np.divide((tp + tn) * 100, total, out=np.zeros_like(total), where=total > 0)
+    fallback = accuracy if empty is None else np.full_like(accuracy, empty)
+    predicted = tp + fp
+    relevant = tp + fn
+    precision = np.where(predicted > 0, np.divide(tp * 100, predicted, out=np.zeros_like(tp), where=predicted > 0), fallback)
+    recall = np.where(relevant > 0, np.divide(tp * 100, relevant, out=np.zeros_like(tp), where=relevant > 0), fallback)
+    return accuracy, precision, recall
+
+
+def get_measure(recommended, actual, unknown_as_negative=False, empty=None):
+    """[accuracy, precision, recall] (%) trên trục cuối; 1 user -> mảng 3 phần tử, batch -> (n_users x 3)"""
+    counts = confusion_counts(recommended, actual, unknown_as_negative)
+    return np.stack(confusion_scores(counts, empty), axis=-1)
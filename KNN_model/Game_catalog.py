@@ -0,0 +1,124 @@
+"""
+Game Catalog - Danh mục game dùng chung cho KNN, Content-Based và Hybrid
+Load 1 lần, sau đó mọi tra cứu là O(1) thay vì lọc DataFrame / list.index() mỗi lần:
+- row_of: app_id -> số dòng
+- title_to_id / normalized_to_id: tên game (gốc / đã chuẩn hóa) -> app_id
+- rows_of / align: ánh xạ cả mảng app_id (vd. cột của ma trận model) -> số dòng, 1 lần get_indexer
+- price / reviews / positive_ratio: mảng numpy theo số dòng (tính toán vector hóa)
+
+Hai nguồn dữ liệu:
+- KNN: final_games.csv (app_id, title, positive_ratio, user_reviews, price_final)
+- CB:  DataFrame của ContentBased_data_handler.load_games_csv (index AppID, Name, Price, Positive, Negative)
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+
+_catalog_cache = {}
+
+
+def normalize_name(title):
+    """Chữ thường, chỉ giữ chữ và số (giống Hybrid_recommendations_reader / reduce_data)"""
+    if not isinstance(title, str): return ""
+    return re.sub(r'[^a-z0-9]', '', title.lower())
+
+
+def _numeric_column(df, column, default=0.0):
+    if column in df.columns:
+        return pd.to_numeric(df[column], errors='coerce').fillna(default).to_numpy(dtype=np.float64)
+    return np.full(len(df), default, dtype=np.float64)
+
+
+class GameCatalog:
+    def __init__(self, frame, app_ids, titles, price, reviews, positive_ratio):
+        self.frame = frame
+        self.app_ids = np.asarray(app_ids, dtype=np.int64)
+        self.titles = np.asarray(titles, dtype=object)
+        self.price = price
+        self.reviews = reviews
+        self.positive_ratio = positive_ratio
+
+        # ID / tên trùng nhau -> giữ dòng xuất hiện đầu tiên (giống df[df['title'] == name].values[0])
+        unique_ids, self._first_rows = np.unique(self.app_ids, return_index=True)
+        self._index = pd.Index(unique_ids)
+        self.row_of = {}
+        self.title_to_id = {}
+        self.normalized_to_id = {}
+        for row, (title, app_id) in enumerate(zip(self.titles.tolist(), self.app_ids.tolist())):
+            self.row_of.setdefault(app_id, row)
+            self.title_to_id.setdefault(title, app_id)
+            self.normalized_to_id.setdefault(normalize_name(title), app_id)
+
+    @classmethod
+    def from_knn_games(cls, df):
+        """Từ final_games.csv của KNN"""
+        return cls(
+            df,
+            df['app_id'].to_numpy(),
+            df['title'].astype(str).to_numpy(),
+            _numeric_column(df, 'price_final'),
+            _numeric_column(df, 'user_reviews'),
+            _numeric_column(df, 'positive_ratio'),
+        )
+
+    @classmethod
+    def from_cb_games(cls, df):
+        """Từ DataFrame CB đã làm sạch (index = AppID)"""
+        positive = _numeric_column(df, 'Positive')
+        reviews = positive + _numeric_column(df, 'Negative')
+        positive_ratio = np.divide(positive * 100, reviews, out=np.zeros_like(reviews), where=reviews > 0)
+        names = df['Name'].astype(str).to_numpy() if 'Name' in df.columns else np.full(len(df), '')
+        return cls(df, df.index.to_numpy(), names, _numeric_column(df, 'Price'), reviews, positive_ratio)
+
+    def __len__(self):
+        return len(self.app_ids)
+
+    def __contains__(self, app_id):
+        return app_id in self.row_of
+
+    def rows_of(self, app_ids):
+        """Mảng app_id -> mảng số dòng (-1 nếu không có trong catalog)"""
+        positions = self._index.get_indexer(np.asarray(app_ids, dtype=np.int64))
+        return np.where(positions >= 0, self._first_rows[positions], -1)
+
+    def align(self, column_app_ids):
+        """
+        Cột của 1 ma trận model (matrix column -> app_id) -> số dòng catalog tương ứng.
+        Dùng để lấy price / reviews / ... theo đúng thứ tự cột: catalog.price[rows].
+        """
+        return self.rows_of(column_app_ids)
+
+    def app_id_of_title(self, title):
+        """Tên game -> app_id (khớp đúng tên trước, sau đó mới tới tên đã chuẩn hóa); None nếu không thấy"""
+        app_id = self.title_to_id.get(title)
+        if app_id is None:
+            app_id = self.normalized_to_id.get(normalize_name(title))
+        return app_id
+
+    def app_ids_of_titles(self, titles):
+        """Series tên game -> Series app_id (NaN nếu không thấy)"""
+        titles = pd.Series(titles)
+        exact = titles.map(self.title_to_id)
+        missing = exact.isna()
+        if missing.any():
+            # Chỉ chuẩn hóa (regex) những tên không khớp đúng
+            exact[missing] = titles[missing].map(normalize_name).map(self.normalized_to_id)
+        return exact
+
+    def details(self, app_ids):
+        """Các dòng của frame theo đúng thứ tự app_ids (bỏ id không có trong catalog)"""
+        rows = self.rows_of(app_ids)
+        return self.frame.iloc[rows[rows >= 0]]
+
+
+def load_game_catalog(dir_path, file_name="final_games.csv"):
+    """Catalog KNN trong dir_path; cache theo (đường dẫn, mtime) để cả phiên chỉ đọc CSV 1 lần"""
+    path = os.path.abspath(os.path.join(dir_path, file_name))
+    mtime = os.path.getmtime(path)
+    cached = _catalog_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, GameCatalog.from_knn_games(pd.read_csv(path)))
+        _catalog_cache[path] = cached
+    return cached[1]
@@ -0,0 +1,169 @@
+"""
+Game Crosswalk - Bảng đối chiếu AppID giữa dataset KNN (final_games.csv) và CB (CB_games.csv)
+2 dataset lệch ID nên trước đây Hybrid phải chạy normalize_name (regex) trên từng ứng viên rồi
+outer-join theo tên. Bảng này làm việc đó 1 lần cho mỗi lần làm mới dữ liệu:
+- knn_app_id / cb_app_id: ID của game ở từng bên (0 = bên đó không có game này)
+- canonical_key: mã số nguyên của tên đã chuẩn hóa -> Hybrid ghép 2 bên bằng join số nguyên
+- canonical_title: tên đã chuẩn hóa (chỉ dùng khi gặp game chưa có trong bảng)
+- match_confidence: 1.0 cùng ID, 0.9 cùng tên gốc, 0.8 chỉ cùng tên chuẩn hóa, 0 chỉ có ở 1 bên
+Game có tên chuẩn hóa rỗng (vd. tên toàn ký tự không phải a-z0-9) không được ghép với game nào.
+
+Lưu ở KNN_model/game_crosswalk.pkl, tự build lại khi final_games.csv hoặc CB_games.csv thay đổi.
+Build thủ công (sau khi chạy reduce_data.py / Data_preprocessing.py):
+    python Game_crosswalk.py
+"""
+
+import os
+import sys
+import hashlib
+import pickle
+import numpy as np
+import pandas as pd
+
+from Game_catalog import load_game_catalog, normalize_name
+
+CROSSWALK_FILE = "game_crosswalk.pkl"
+CROSSWALK_VERSION = 1
+COLUMNS = ['knn_app_id', 'cb_app_id', 'canonical_key', 'canonical_title', 'match_confidence']
+
+_crosswalk_cache = {}
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _side_frame(catalog, id_column):
+    """(app_id, title, canonical_title) của 1 catalog, mỗi app_id 1 dòng (giữ dòng đầu như GameCatalog)"""
+    frame = pd.DataFrame({id_column: catalog.app_ids, 'title': catalog.titles}).drop_duplicates(id_column)
+    frame['canonical_title'] = frame['title'].map(normalize_name)
+    return frame
+
+
+def _name_key(name):
+    """Mã âm (không trùng mã trong bảng) cho tên chưa có trong bảng, 2 bên tính ra giống nhau"""
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest()
+    return -(int.from_bytes(digest, 'little') >> 1) - 1
+
+
+class GameCrosswalk:
+    def __init__(self, table):
+        self.table = table
+        self._keys = {}
+        for side in ('knn', 'cb'):
+            rows = table[table[f'{side}_app_id'] != 0].drop_duplicates(f'{side}_app_id')
+            self._keys[side] = (pd.Index(rows[f'{side}_app_id'].to_numpy()), rows['canonical_key'].to_numpy())
+        named = table[table['canonical_title'] != '']
+        self._key_of_title = dict(zip(named['canonical_title'].tolist(), named['canonical_key'].tolist()))
+
+    @classmethod
+    def build(cls, knn_catalog, cb_catalog):
+        knn = _side_frame(knn_catalog, 'knn_app_id')
+        cb = _side_frame(cb_catalog, 'cb_app_id')
+        matched = pd.merge(
+            knn[knn['canonical_title'] != ''], cb[cb['canonical_title'] != ''],
+            on='canonical_title', how='outer', suffixes=('_knn', '_cb')
+        )
+        unnamed = pd.concat([knn[knn['canonical_title'] == ''], cb[cb['canonical_title'] == '']], ignore_index=True)
+        table = pd.concat([matched, unnamed], ignore_index=True)
+        table[['knn_app_id', 'cb_app_id']] = table[['knn_app_id', 'cb_app_id']].fillna(0).astype(np.int64)
+
+        both = (table['knn_app_id'] != 0) & (table['cb_app_id'] != 0)
+        table['match_confidence'] = np.select(
+            [both & (table['knn_app_id'] == table['cb_app_id']), both & (table['title_knn'] == table['title_cb']), both],
+            [1.0, 0.9, 0.8], default=0.0
+        )
+        # Mỗi tên chuẩn hóa 1 mã; game tên rỗng mỗi game 1 mã riêng
+        keys, _ = pd.factorize(table['canonical_title'])
+        unnamed_rows = (table['canonical_title'] == '').to_numpy()
+        keys[unnamed_rows] = keys.max(initial=-1) + 1 + np.arange(unnamed_rows.sum())
+        table['canonical_key'] = keys.astype(np.int64)
+        return cls(table[COLUMNS].reset_index(drop=True))
+
+    def keys(self, side, app_ids, titles=None):
+        """
+        app_id của 1 bên ('knn' / 'cb') -> canonical_key (mảng int64), tra bằng mảng (không xử lý chuỗi).
+        Game không có trong bảng (vd. game mới fold-in vào CB): tìm theo tên chuẩn hóa nếu có titles,
+        không thì nhận mã riêng không ghép được.
+        """
+        index, keys = self._keys[side]
+        app_ids = pd.to_numeric(pd.Series(app_ids), errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+        positions = index.get_indexer(app_ids)
+        result = np.where(positions >= 0, keys[positions], 0)
+        titles = list(titles) if titles is not None else None
+        for i in np.flatnonzero(positions < 0):
+            name = normalize_name(titles[i]) if titles is not None else ''
+            if not name:
+                name = f"#{side}{app_ids[i]}" if app_ids[i] != 0 else f"#{side}row{i}"
+            key = self._key_of_title.get(name)
+            result[i] = key if key is not None else _name_key(name)
+        return result
+
+    def matched_ids(self, side):
+        """app_id của 1 bên có game tương ứng ở bên kia"""
+        column = f'{side}_app_id'
+        return set(self.table.loc[self.table['match_confidence'] > 0, column].tolist())
+
+    def save(self, path, sources):
+        with open(path + ".tmp", 'wb') as f:
+            pickle.dump({'version': CROSSWALK_VERSION, 'sources': sources, 'table': self.table}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+
+def _cb_catalog(cb_dir):
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CB_model"))
+    from ContentBased_data_handler import load_games_catalog
+    return load_games_catalog(os.path.join(cb_dir, "CB_games.csv"))
+
+
+def build_game_crosswalk(knn_dir, cb_dir, path=None):
+    """Build + lưu bảng đối chiếu từ final_games.csv và CB_games.csv; None nếu thiếu dữ liệu"""
+    path = path or os.path.join(knn_dir, CROSSWALK_FILE)
+    try:
+        sources = [_source_signature(os.path.join(knn_dir, "final_games.csv")),
+                   _source_signature(os.path.join(cb_dir, "CB_games.csv"))]
+        cb_catalog = _cb_catalog(cb_dir)
+        if cb_catalog is None:
+            return None
+        crosswalk = GameCrosswalk.build(load_game_catalog(knn_dir), cb_catalog)
+        crosswalk.save(path, sources)
+        matched = (crosswalk.table['match_confidence'] > 0).sum()
+        print(f"Game crosswalk built: {matched} matched pairs, {len(crosswalk.table)} rows -> {path}")
+        _crosswalk_cache[os.path.abspath(path)] = (sources, crosswalk)
+        return crosswalk
+    except Exception as e:
+        print(f"Could not build game crosswalk: {e}")
+        return None
+
+
+def load_game_crosswalk(knn_dir, cb_dir, path=None):
+    """Bảng đối chiếu đã lưu; build lại nếu chưa có hoặc 1 trong 2 file nguồn đã đổi. None nếu thiếu dữ liệu"""
+    path = path or os.path.join(knn_dir, CROSSWALK_FILE)
+    try:
+        sources = [_source_signature(os.path.join(knn_dir, "final_games.csv")),
+                   _source_signature(os.path.join(cb_dir, "CB_games.csv"))]
+    except OSError:
+        return None
+    cached = _crosswalk_cache.get(os.path.abspath(path))
+    if cached is not None and cached[0] == sources:
+        return cached[1]
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                stored = pickle.load(f)
+            if stored.get('version') == CROSSWALK_VERSION and stored.get('sources') == sources:
+                crosswalk = GameCrosswalk(stored['table'])
+                _crosswalk_cache[os.path.abspath(path)] = (sources, crosswalk)
+                return crosswalk
+        except Exception as e:
+            print(f"Could not read {path}: {e}")
+    return build_game_crosswalk(knn_dir, cb_dir, path)
+
+
+if __name__ == "__main__":
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    knn_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(project_root, "KNN_model")
+    cb_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(project_root, "CB_model")
+    build_game_crosswalk(knn_dir, cb_dir)
@@ -0,0 +1,130 @@
+"""
+Item-Item Similarity - Chế độ Collaborative Filtering theo game (Item-Based)
+Tính offline cho mỗi game Top-N game giống nhất (cosine trên vector Like/Dislike của các user),
+bằng phép nhân thưa X^T . X theo từng khối game. Kết quả là bảng hàng xóm gọn:
+- neighbours: int32 (n_apps x N) chỉ số cột game
+- similarities: float16 (n_apps x N)
+Khi gợi ý: điểm = tổng có trọng số của danh sách hàng xóm các game bạn đã review
+-> không phụ thuộc số lượng user.
+
+Build 1 lần sau khi có review store:
+    python Item_similarity.py
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+
+from Review_store import load_review_store, STORE_DIR_NAME
+
+INDEX_DIR_NAME = "item_neighbours"
+INDEX_VERSION = 1
+TOP_N = 100
+BLOCK_SIZE = 1000
+
+
+class ItemSimilarityModel:
+    def __init__(self, neighbours, similarities, app_ids, manifest):
+        self.neighbours = neighbours
+        self.similarities = similarities
+        self.app_ids = app_ids
+        self.manifest = manifest
+
+    @classmethod
+    def build(cls, store, top_n=TOP_N, block_size=BLOCK_SIZE):
+        """X^T . X theo khối game, chuẩn hóa cosine, giữ Top-N mỗi dòng"""
+        start = time.time()
+        user_matrix = store.user_matrix().astype(np.float32)
+        item_matrix = user_matrix.T.tocsr()  # Game x User
+        norms = np.sqrt(np.asarray(item_matrix.multiply(item_matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+
+        n_apps = store.n_apps
+        top_n = min(top_n, max(n_apps - 1, 1))
+        neighbours = np.zeros((n_apps, top_n), dtype=np.int32)
+        similarities = np.zeros((n_apps, top_n), dtype=np.float16)
+
+        for begin in range(0, n_apps, block_size):
+            end = min(begin + block_size, n_apps)
+            co_occurrence = (item_matrix[begin:end] @ user_matrix).toarray()
+            co_occurrence /= norms[begin:end, None]
+            co_occurrence /= norms[None, :]
+            co_occurrence[np.arange(end - begin), np.arange(begin, end)] = -np.inf  # Bỏ chính nó
+
+            top = np.argpartition(-co_occurrence, top_n - 1, axis=1)[:, :top_n]
+            top_sim = np.take_along_axis(co_occurrence, top, axis=1)
+            order = np.argsort(-top_sim, axis=1, kind='stable')
+            neighbours[begin:end] = np.take_along_axis(top, order, axis=1)
+            similarities[begin:end] = np.maximum(np.take_along_axis(top_sim, order, axis=1), 0)
+
+        manifest = {
+            'version': INDEX_VERSION,
+            'top_n': int(top_n),
+            'n_apps': int(n_apps),
+            'store_signature': store.signature(),
+        }
+        print(f"Item neighbour table built: {n_apps} games x top {top_n} ({time.time() - start:.1f}s)")
+        return cls(neighbours, similarities, np.asarray(store.app_ids), manifest)
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "neighbours.npy"), self.neighbours)
+        np.save(os.path.join(index_dir, "similarities.npy"), self.similarities)
+        np.save(os.path.join(index_dir, "app_ids.npy"), self.app_ids)
+        with open(os.path.join(index_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir, mmap_mode='r'):
+        with open(os.path.join(index_dir, "manifest.json"), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        arrays = [np.load(os.path.join(index_dir, name + ".npy"), mmap_mode=mmap_mode)
+                  for name in ('neighbours', 'similarities', 'app_ids')]
+        return cls(*arrays, manifest)
+
+    def score(self, app_ids, values):
+        """
+        Điểm cho mọi game = sum(value của game đã review * similarity) trên danh sách hàng xóm.
+        Trả về mảng điểm theo thứ tự self.app_ids.
+        """
+        app_ids = np.asarray(app_ids, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        pos = np.searchsorted(self.app_ids, app_ids)
+        pos = np.minimum(pos, len(self.app_ids) - 1)
+        known = self.app_ids[pos] == app_ids
+        rows, values = pos[known], values[known]
+
+        neighbour_rows = np.asarray(self.neighbours[rows])
+        contributions = np.asarray(self.similarities[rows], dtype=np.float64) * values[:, None]
+        return np.bincount(neighbour_rows.ravel(), weights=contributions.ravel(), minlength=len(self.app_ids))
+
+    def recommend_ids(self, app_ids, values):
+        """Danh sách (app_id, relevance) > 0, sắp xếp giảm dần"""
+        scores = self.score(app_ids, values)
+        positive = np.flatnonzero(scores > 0)
+        order = positive[np.argsort(-scores[positive], kind='stable')]
+        return [(self.app_ids[i], scores[i]) for i in order]
+
+
+def load_item_similarity(dir_path, store=None):
+    """Load bảng hàng xóm trong review store; build 1 lần nếu chưa có hoặc store đã đổi"""
+    if store is None:
+        store = load_review_store(dir_path)
+    index_dir = os.path.join(dir_path, STORE_DIR_NAME, INDEX_DIR_NAME)
+    manifest_path = os.path.join(index_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == INDEX_VERSION and manifest.get('store_signature') == store.signature():
+            return ItemSimilarityModel.load(index_dir)
+    model = ItemSimilarityModel.build(store)
+    model.save(index_dir)
+    return model
+
+
+if __name__ == "__main__":
+    knn_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    review_store = load_review_store(knn_dir)
+    ItemSimilarityModel.build(review_store).save(os.path.join(knn_dir, STORE_DIR_NAME, INDEX_DIR_NAME))
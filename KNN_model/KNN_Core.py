@@ -0,0 +1,389 @@
+"""
+KNN Collaborative Filtering Engine (User-Based)
+Chạy lại toàn bộ logic của knn_model.ipynb (getKnnVector / getRecommendedGameId / getRecommendation)
+ngay trong process: dữ liệu được load 1 lần và giữ trong bộ nhớ, mỗi lần gợi ý chỉ còn bước tính toán.
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_distances
+from Review_store import load_review_store
+from User_LSH import load_user_lsh, PROBE_RADIUS
+from Item_similarity import load_item_similarity
+from Game_catalog import load_game_catalog
+
+# --- CẤU HÌNH (giống notebook) ---
+MATCH_PERCENTAGE = 0.5  # User kia cần review trùng ít nhất 50% game của bạn
+MAX_K = 1000            # Số hàng xóm tối đa
+EPSILON = 1e-9          # Tránh chia cho 0 khi khoảng cách = 0
+FAV_MULTIPLIER = 4      # Mỗi game yêu thích mà hàng xóm cũng Like -> trọng số x4
+BAD_GAME_DIVISOR = 2    # Mỗi game bạn Dislike mà hàng xóm lại Like -> trọng số /2 (1 = tắt)
+MODES = ('user', 'item')  # 'user': User-Based KNN (mặc định) ; 'item': bảng Item-Item tính sẵn
+
+RESULT_COLUMNS = ['sort_rank', 'title', 'date_release', 'relevance', 'positive_ratio', 'user_reviews']  # rcm_games.csv / bảng trên UI
+OUTPUT_COLUMNS = RESULT_COLUMNS + ['app_id']  # recommend() trả thêm app_id để Hybrid ghép theo ID (không tìm lại theo tên)
+
+
+def nearest_neighbours(distances, k):
+    """
+    Chỉ số của k khoảng cách nhỏ nhất, sắp xếp tăng dần (hòa -> chỉ số nhỏ trước, giống sorted() ổn định).
+    Dùng np.argpartition nên chi phí O(n + k log k) thay vì sort toàn bộ danh sách.
+    """
+    n = len(distances)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        kth = distances[np.argpartition(distances, k - 1)[:k]].max()
+        closer = np.flatnonzero(distances < kth)
+        ties = np.flatnonzero(distances == kth)[:k - len(closer)]
+        candidates = np.concatenate([closer, ties])
+    else:
+        candidates = np.arange(n)
+    return candidates[np.lexsort((candidates, distances[candidates]))]
+
+
+def neighbour_weights(user_vector_sparse, games_id_reviews, fav_games_id, bad_games_id=(),
+                      fav_multiplier=FAV_MULTIPLIER, bad_game_divisor=BAD_GAME_DIVISOR):
+    """
+    Trọng số hàng xóm = base * fav_multiplier^(số game yêu thích họ Like) / bad_game_divisor^(số game bạn ghét họ Like)
+    Tính bằng 1 phép nhân ma trận thưa x vector: exp(Like_matrix . (log(fav) * fav_ind - log(bad) * bad_ind))
+    """
+    games_id_reviews = np.asarray(games_id_reviews)
+    fav_games_id = list(fav_games_id)
+    base = 1 / (10 ** int(len(set(fav_games_id)) ** 0.5))
+
+    exponent = np.zeros(len(games_id_reviews))
+    exponent[np.isin(games_id_reviews, fav_games_id)] = np.log(fav_multiplier)
+    bad_mask = np.isin(games_id_reviews, list(bad_games_id)) & (exponent == 0)
+    exponent[bad_mask] = -np.log(bad_game_divisor)
+
+    # Ma trận "Like" (review == 1) dùng chung indices/indptr với ma trận gốc
+    likes = csr_matrix(
+        ((user_vector_sparse.data == 1).astype(np.float64), user_vector_sparse.indices, user_vector_sparse.indptr),
+        shape=user_vector_sparse.shape
+    )
+    return base * np.exp(likes @ exponent)
+
+
+def _values_on_pattern(pattern, matrix):
+    """Giá trị của matrix tại các ô khác 0 của pattern (CSR đã sort indices), theo thứ tự pattern.data"""
+    mask = csr_matrix((np.ones(pattern.nnz), pattern.indices, pattern.indptr), shape=pattern.shape)
+    sub = csr_matrix(mask.multiply(matrix))
+    sub.sum_duplicates()
+    n_cols = pattern.shape[1]
+    pattern_keys = np.repeat(np.arange(pattern.shape[0], dtype=np.int64), np.diff(pattern.indptr)) * n_cols + pattern.indices
+    sub_keys = np.repeat(np.arange(sub.shape[0], dtype=np.int64), np.diff(sub.indptr)) * n_cols + sub.indices
+    values = np.zeros(pattern.nnz)
+    values[np.searchsorted(pattern_keys, sub_keys)] = sub.data
+    return values
+
+
+class KNNRecommender:
+    def __init__(self, dir_path, match_percentage=MATCH_PERCENTAGE,
+                 fav_multiplier=FAV_MULTIPLIER, bad_game_divisor=BAD_GAME_DIVISOR,
+                 use_ann=False, ann_tables=None, ann_probe_radius=PROBE_RADIUS, mode='user'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown KNN mode: {mode} (expected one of {MODES})")
+        self.dir_path = dir_path
+        self.mode = mode
+        self.match_percentage = match_percentage
+        self.fav_multiplier = fav_multiplier
+        self.bad_game_divisor = bad_game_divisor
+        # ANN (LSH): chỉ tính cosine chính xác trên shortlist; ann_tables / ann_probe_radius = nút recall <-> tốc độ
+        self.use_ann = use_ann
+        self.ann_tables = ann_tables
+        self.ann_probe_radius = ann_probe_radius
+        self.ann_index = None
+        self.item_model = None
+        self._item_matrix = None
+        self._user_norms = None
+        self.store = None
+        self.games_details = None
+        self.catalog = None
+        self.is_loaded = False
+
+    def load_data(self):
+        """Load review store (mmap) và final_games.csv (chỉ 1 lần cho cả phiên làm việc)"""
+        if self.is_loaded:
+            return True
+        try:
+            print("Loading KNN data...")
+            self.store = load_review_store(self.dir_path)
+            if self.use_ann:
+                self.ann_index = load_user_lsh(self.dir_path, self.store)
+            if self.mode == 'item':
+                self.item_model = load_item_similarity(self.dir_path, self.store)
+            self.catalog = load_game_catalog(self.dir_path)
+            self.games_details = self.catalog.frame
+            self.is_loaded = True
+            print(f"KNN data loaded. {len(self.store)} reviews, {len(self.games_details)} games.")
+            return True
+        except Exception as e:
+            print(f"Load failed: {e}")
+            return False
+
+    def get_neighbour_matrix(self, my_games_id, my_values=None):
+        """
+        Lọc hàng xóm (BƯỚC 1-4 trong notebook) và dựng ma trận thưa User x Game.
+        my_values: giá trị review tương ứng my_games_id (chỉ cần cho chế độ ANN).
+        Trả về (user_vector_sparse, games_id_reviews).
+        """
+        threshold = max(1, int(len(my_games_id) * self.match_percentage))
+        store = self.store
+
+        my_app_index = store.app_index_of(my_games_id)
+        known = my_app_index >= 0
+        if self.ann_index is not None:
+            # Shortlist từ LSH, rồi mới áp ngưỡng trùng game trên shortlist
+            values = np.ones(len(my_games_id)) if my_values is None else np.asarray(my_values, dtype=float)
+            shortlist = self.ann_index.candidates(my_app_index[known], values[known],
+                                                  self.ann_tables, self.ann_probe_radius)
+            relevant_users = store.filter_by_overlap(shortlist, my_app_index[known], threshold)
+        else:
+            # Hàng xóm = user đã review ít nhất `threshold` game của bạn (tra chỉ mục ngược app -> users)
+            relevant_users = store.candidate_users(my_app_index[known], threshold)
+
+        # Lấy TOÀN BỘ review của những user này (cắt dòng từ CSR toàn cục)
+        user_vector_sparse, games_id_reviews = store.neighbour_matrix(relevant_users)
+        return user_vector_sparse, list(games_id_reviews)
+
+    def get_my_vector(self, your_games, games_id_reviews):
+        """Vector đánh giá của bạn trên không gian game của các hàng xóm"""
+        app_to_index = {app_id: idx for idx, app_id in enumerate(games_id_reviews)}
+        my_vector = {}
+        for game_id, review_value in zip(your_games['gameID'], your_games['review']):
+            if game_id in app_to_index:
+                my_vector[app_to_index[game_id]] = review_value
+        return csr_matrix(
+            (list(my_vector.values()), ([0] * len(my_vector), list(my_vector.keys()))),
+            shape=(1, len(games_id_reviews))
+        )
+
+    def get_weights(self, user_vector_sparse, games_id_reviews, fav_games_id, bad_games_id=()):
+        """Trọng số hàng xóm theo game yêu thích / game bị Dislike (xem neighbour_weights)"""
+        return neighbour_weights(user_vector_sparse, games_id_reviews, fav_games_id, bad_games_id,
+                                 self.fav_multiplier, self.bad_game_divisor)
+
+    def get_knn_vector(self, user_vector_sparse, my_vector, weights, k):
+        """Cộng gộp vector của k hàng xóm gần nhất, trọng số = weight / distance"""
+        distances = cosine_distances(user_vector_sparse, my_vector).flatten()
+
+        # Lấy k người gần nhất rồi gom k dòng bằng 1 lần fancy-index
+        indices = nearest_neighbours(distances, k)
+
+        weights_factors = weights[indices] / (distances[indices] + EPSILON)
+        weighted_vectors = user_vector_sparse[indices].multiply(weights_factors[:, None])
+        return np.asarray(weighted_vectors.sum(axis=0)).ravel()
+
+    def get_recommended_game_id(self, your_games, fav_games, k=MAX_K):
+        """Danh sách (app_id, relevance) sắp xếp giảm dần theo relevance"""
+        my_games_id = sorted(your_games['gameID'].unique())
+        if not my_games_id:
+            return []
+
+        my_values = your_games.drop_duplicates('gameID', keep='last').set_index('gameID')['review'].reindex(my_games_id)
+        user_vector_sparse, games_id_reviews = self.get_neighbour_matrix(my_games_id, my_values.to_numpy())
+        if user_vector_sparse.shape[0] == 0:
+            return []
+
+        my_vector = self.get_my_vector(your_games, games_id_reviews)
+        bad_games_id = your_games[your_games['review'] == -1]['gameID']
+        weights = self.get_weights(user_vector_sparse, games_id_reviews, fav_games['gameID'], bad_games_id)
+        vector = self.get_knn_vector(user_vector_sparse, my_vector, weights, min(k, user_vector_sparse.shape[0]))
+
+        positive = np.flatnonzero(vector > 0)
+        order = positive[np.argsort(-vector[positive], kind='stable')]
+        return [(games_id_reviews[i], vector[i]) for i in order]
+
+    def get_item_based_game_id(self, your_games, fav_games):
+        """Chế độ Item-Based: cộng dồn danh sách hàng xóm của các game bạn đã review"""
+        profile = your_games.drop_duplicates('gameID', keep='last')
+        values = profile['review'].to_numpy(dtype=float, copy=True)
+        values[profile['gameID'].isin(set(fav_games['gameID'])).to_numpy()] *= self.fav_multiplier
+        return self.item_model.recommend_ids(profile['gameID'].to_numpy(), values)
+
+    def get_batch_inputs(self, profiles):
+        """Ma trận query Q, ma trận số mũ trọng số E (n_profiles x n_apps), base và threshold của từng profile"""
+        store = self.store
+        q_rows, q_cols, q_vals = [], [], []
+        e_rows, e_cols, e_vals = [], [], []
+        thresholds = np.zeros(len(profiles))
+        base = np.zeros(len(profiles))
+
+        for i, (your_games, fav_games) in enumerate(profiles):
+            profile = your_games.drop_duplicates('gameID', keep='last')
+            thresholds[i] = max(1, int(len(profile) * self.match_percentage))
+            app_index = store.app_index_of(profile['gameID'])
+            known = app_index >= 0
+            q_rows.append(np.full(known.sum(), i))
+            q_cols.append(app_index[known])
+            q_vals.append(profile['review'].to_numpy(dtype=float)[known])
+
+            fav_games_id = set(fav_games['gameID'])
+            base[i] = 1 / (10 ** int(len(fav_games_id) ** 0.5))
+            fav_index = store.app_index_of(list(fav_games_id))
+            fav_index = np.unique(fav_index[fav_index >= 0])
+            bad_index = store.app_index_of(profile[profile['review'] == -1]['gameID'])
+            bad_index = np.setdiff1d(bad_index[bad_index >= 0], fav_index)
+            e_rows.append(np.full(len(fav_index) + len(bad_index), i))
+            e_cols.append(np.concatenate([fav_index, bad_index]))
+            e_vals.append(np.concatenate([np.full(len(fav_index), np.log(self.fav_multiplier)),
+                                          np.full(len(bad_index), -np.log(self.bad_game_divisor))]))
+
+        shape = (len(profiles), store.n_apps)
+        query = csr_matrix((np.concatenate(q_vals), (np.concatenate(q_rows), np.concatenate(q_cols))), shape=shape)
+        exponent = csr_matrix((np.concatenate(e_vals), (np.concatenate(e_rows), np.concatenate(e_cols))), shape=shape)
+        query.sum_duplicates()
+        return query, exponent, base, thresholds
+
+    def score_batch(self, profiles, k=MAX_K):
+        """
+        Điểm KNN (User-Based, exact) cho nhiều profile cùng lúc bằng các phép nhân ma trận thưa.
+        profiles: list (your_games, fav_games). Trả về CSR (n_profiles x n_apps) theo cột của review store.
+        """
+        store = self.store
+        user_matrix = store.user_matrix()
+        if self._item_matrix is None:
+            self._item_matrix = user_matrix.T.tocsr()  # Game x User (có giá trị), dựng 1 lần
+            self._user_norms = np.sqrt(np.asarray(user_matrix.multiply(user_matrix).sum(axis=1)).ravel())
+        item_matrix = self._item_matrix
+
+        query, exponent, base, thresholds = self.get_batch_inputs(profiles)
+        query_indicator = query.copy()
+        query_indicator.data = np.ones_like(query_indicator.data)
+
+        # 1. Hàng xóm ứng viên: số game trùng (Q_ind . posting) >= threshold
+        overlap = csr_matrix(query_indicator @ store.posting_matrix())
+        overlap.sum_duplicates()
+        overlap_rows = np.repeat(np.arange(len(profiles)), np.diff(overlap.indptr))
+        keep = overlap.data >= thresholds[overlap_rows]
+        candidates = csr_matrix(
+            (np.ones(keep.sum()), (overlap_rows[keep], overlap.indices[keep])), shape=overlap.shape
+        )
+        candidates.sort_indices()
+        rows = np.repeat(np.arange(len(profiles)), np.diff(candidates.indptr))
+        users = candidates.indices
+
+        # 2. Khoảng cách cosine: Q . X^T trên các ô ứng viên.
+        # Norm của query chỉ tính trên các game mà ít nhất 1 ứng viên đã review (giống không gian cột của bản đơn lẻ)
+        dots = _values_on_pattern(candidates, query @ item_matrix)
+        query_columns = np.unique(query.indices)
+        column_reviewed = item_matrix[query_columns]
+        column_reviewed.data = np.ones_like(column_reviewed.data, dtype=np.float64)
+        coverage = candidates @ column_reviewed.T  # n_profiles x query_columns
+        query_sub = csr_matrix(query[:, query_columns])
+        query_sub.sort_indices()
+        covered = _values_on_pattern(query_sub, coverage) > 0
+        query_sub_rows = np.repeat(np.arange(len(profiles)), np.diff(query_sub.indptr))
+        query_norms = np.sqrt(np.bincount(query_sub_rows, weights=query_sub.data ** 2 * covered,
+                                          minlength=len(profiles)))
+        denominator = query_norms[rows] * self._user_norms[users]
+        similarity = np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+        distances = np.clip(1 - similarity, 0, 2)
+
+        # 3. Trọng số hàng xóm: base * exp(E . Like^T)
+        likes = item_matrix.copy()
+        likes.data = (likes.data == 1).astype(np.float64)
+        weights = base[rows] * np.exp(_values_on_pattern(candidates, exponent @ likes))
+
+        # 4. Top-k mỗi dòng: sort (profile, distance, user) rồi giữ k vị trí đầu của mỗi profile
+        order = np.lexsort((users, distances, rows))
+        rank = np.arange(len(order)) - candidates.indptr[rows[order]]
+        selected = order[rank < k]
+
+        # 5. Cộng gộp: (n_profiles x User) . X
+        factors = weights[selected] / (distances[selected] + EPSILON)
+        neighbour_factors = csr_matrix(
+            (factors, (rows[selected], users[selected])), shape=(len(profiles), store.n_users)
+        )
+        return csr_matrix(neighbour_factors @ user_matrix)
+
+    def recommend_batch(self, profiles, k=MAX_K):
+        """
+        Gợi ý cho nhiều user 1 lần. profiles: list (your_games, fav_games).
+        Trả về list (recommendation, recommendation_wish) theo thứ tự profiles.
+        Chế độ 'user' luôn tính chính xác (không dùng ANN) qua score_batch.
+        """
+        if not self.load_data():
+            empty = pd.DataFrame(columns=OUTPUT_COLUMNS)
+            return [(empty, empty) for _ in profiles]
+        if not profiles:
+            return []
+
+        start = time.time()
+        results = []
+        if self.mode == 'item':
+            for your_games, fav_games in profiles:
+                rcm = self.get_item_based_game_id(your_games, fav_games)
+                results.append(self.get_recommendation(rcm, your_games))
+        else:
+            scores = self.score_batch(profiles, k)
+            app_ids = self.store.app_ids
+            for i, (your_games, fav_games) in enumerate(profiles):
+                row = scores.getrow(i)
+                positive = row.indices[row.data > 0]
+                values = row.data[row.data > 0]
+                order = np.lexsort((positive, -values))
+                rcm = list(zip(app_ids[positive[order]], values[order]))
+                results.append(self.get_recommendation(rcm, your_games))
+        print(f"KNN batch recommendations: {len(profiles)} profiles in {time.time() - start:.3f}s")
+        return results
+
+    def get_recommendation(self, rcm, your_games):
+        """Ghép thông tin game, bỏ game đã chơi; trả về (recommendation, recommendation_wish)"""
+        interested_games_id = set(your_games[your_games['review'] == 0.5]['gameID'])
+        not_played_games_id = set(your_games['gameID']) - interested_games_id
+
+        rcm = [game for game in rcm if game[0] not in not_played_games_id]
+        recommended_game_ids = np.array([game[0] for game in rcm], dtype=np.int64)
+        relevance = np.array([game[1] for game in rcm], dtype=np.float64)
+        # Tra dòng trong catalog (hash map) thay cho isin + merge; giữ thứ tự dòng của final_games.csv
+        rows = self.catalog.rows_of(recommended_game_ids)
+        found = np.flatnonzero(rows >= 0)
+        order = found[np.argsort(rows[found], kind='stable')]
+        recommended = self.games_details.iloc[rows[order]].reset_index(drop=True)
+        recommended['relevance'] = relevance[order]
+        recommended = recommended.sort_values(by='relevance', ascending=False)
+        recommended_wish = recommended[recommended['app_id'].isin(interested_games_id)]
+        return recommended[OUTPUT_COLUMNS], recommended_wish[OUTPUT_COLUMNS]
+
+    def recommend(self, your_games, fav_games, k=MAX_K):
+        """
+        Gợi ý game cho 1 user.
+        your_games: DataFrame (gameID, review) ; fav_games: DataFrame (gameID)
+        """
+        if not self.load_data():
+            return pd.DataFrame(columns=OUTPUT_COLUMNS), pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+        start = time.time()
+        if self.mode == 'item':
+            rcm = self.get_item_based_game_id(your_games, fav_games)
+        else:
+            rcm = self.get_recommended_game_id(your_games, fav_games, k)
+        recommendation, recommendation_wish = self.get_recommendation(rcm, your_games)
+        print(f"KNN recommendations: {len(recommendation)} games in {time.time() - start:.3f}s")
+        return recommendation, recommendation_wish
+
+    def save_recommendations(self, recommendation, recommendation_wish, dir_path=None):
+        out_dir = dir_path or self.dir_path
+        recommendation[RESULT_COLUMNS].to_csv(os.path.join(out_dir, "rcm_games.csv"), index=False)
+        recommendation_wish[RESULT_COLUMNS].to_csv(os.path.join(out_dir, "rcm_wish.csv"), index=False)
+
+
+def load_user_profile(dir_path):
+    """Đọc your_games.csv và fav_games.csv (do nút Save Your Data ghi ra)"""
+    your_games_path = os.path.join(dir_path, "your_games.csv")
+    fav_games_path = os.path.join(dir_path, "fav_games.csv")
+    try:
+        your_games = pd.read_csv(your_games_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        your_games = pd.DataFrame(columns=['gameID', 'gameName', 'review'])
+    try:
+        fav_games = pd.read_csv(fav_games_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        fav_games = pd.DataFrame(columns=['gameID', 'gameName'])
+    return your_games, fav_games
@@ -0,0 +1,244 @@
+"""
+Review Store - Lưu final_reviews.csv dưới dạng binary (cột .npy) để load bằng memory-map
+- user_index / app_index: int32 (đã đánh lại chỉ số 0..n-1, theo thứ tự user_id / app_id tăng dần)
+- is_recommended: int8 (1 / -1)
+- indptr: CSR theo user. Các dòng được sắp xếp theo (user, app) nên app_index chính là CSR indices
+  và is_recommended chính là CSR data -> dựng ma trận User x Game không cần copy.
+- app_indptr / app_users: chỉ mục ngược (CSC / posting list) app -> các user đã review game đó,
+  dùng để chọn hàng xóm mà không phải quét toàn bộ bảng review.
+
+Chạy 1 lần sau khi có final_reviews.csv:
+    python Review_store.py
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+STORE_DIR_NAME = "final_reviews_store"
+STORE_VERSION = 2
+CHUNK_SIZE = 2_000_000
+
+ARRAY_FILES = ['user_index', 'app_index', 'is_recommended', 'indptr', 'app_indptr', 'app_users', 'user_ids', 'app_ids']
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'source_size': stat.st_size, 'source_mtime': int(stat.st_mtime)}
+
+
+def build_review_store(csv_path, store_dir, chunk_size=CHUNK_SIZE):
+    """Đọc CSV theo từng chunk (dtype gọn) và ghi ra thư mục store"""
+    start = time.time()
+    print(f"Converting {csv_path} -> {store_dir}")
+
+    user_chunks, app_chunks, rec_chunks = [], [], []
+    reader = pd.read_csv(
+        csv_path,
+        usecols=['app_id', 'is_recommended', 'user_id'],
+        dtype={'app_id': np.int64, 'user_id': np.int64, 'is_recommended': bool},
+        chunksize=chunk_size
+    )
+    for chunk in reader:
+        user_chunks.append(chunk['user_id'].to_numpy())
+        app_chunks.append(chunk['app_id'].to_numpy())
+        rec_chunks.append(np.where(chunk['is_recommended'].to_numpy(), 1, -1).astype(np.int8))
+    print(f"  Parsed CSV in {time.time() - start:.1f}s")
+
+    raw_users = np.concatenate(user_chunks) if user_chunks else np.empty(0, np.int64)
+    raw_apps = np.concatenate(app_chunks) if app_chunks else np.empty(0, np.int64)
+    is_recommended = np.concatenate(rec_chunks) if rec_chunks else np.empty(0, np.int8)
+    del user_chunks, app_chunks, rec_chunks
+
+    # Đánh lại chỉ số (np.unique trả về id đã sắp xếp tăng dần)
+    user_ids, user_index = np.unique(raw_users, return_inverse=True)
+    app_ids, app_index = np.unique(raw_apps, return_inverse=True)
+    user_index = user_index.astype(np.int32)
+    app_index = app_index.astype(np.int32)
+    del raw_users, raw_apps
+
+    # Sắp xếp theo (user, app) -> các cột trở thành CSR
+    order = np.lexsort((app_index, user_index))
+    user_index = user_index[order]
+    app_index = app_index[order]
+    is_recommended = is_recommended[order]
+    del order
+
+    index_dtype = np.int32 if len(app_index) < np.iinfo(np.int32).max else np.int64
+    indptr = np.zeros(len(user_ids) + 1, dtype=index_dtype)
+    np.cumsum(np.bincount(user_index, minlength=len(user_ids)), out=indptr[1:])
+
+    # Posting list app -> users (sort ổn định nên user trong mỗi app vẫn tăng dần)
+    app_order = np.argsort(app_index, kind='stable')
+    app_users = user_index[app_order].astype(index_dtype, copy=False)
+    del app_order
+    app_indptr = np.zeros(len(app_ids) + 1, dtype=index_dtype)
+    np.cumsum(np.bincount(app_index, minlength=len(app_ids)), out=app_indptr[1:])
+
+    os.makedirs(store_dir, exist_ok=True)
+    arrays = {
+        'user_index': user_index,
+        'app_index': app_index.astype(index_dtype, copy=False),
+        'is_recommended': is_recommended,
+        'indptr': indptr,
+        'app_indptr': app_indptr,
+        'app_users': app_users,
+        'user_ids': user_ids,
+        'app_ids': app_ids,
+    }
+    for name, arr in arrays.items():
+        np.save(os.path.join(store_dir, name + ".npy"), arr)
+
+    manifest = {
+        'version': STORE_VERSION,
+        'n_reviews': int(len(is_recommended)),
+        'n_users': int(len(user_ids)),
+        'n_apps': int(len(app_ids)),
+        **_source_signature(csv_path),
+    }
+    with open(os.path.join(store_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"  Store written: {manifest['n_reviews']} reviews, {manifest['n_users']} users, "
+          f"{manifest['n_apps']} games ({time.time() - start:.1f}s)")
+    return manifest
+
+
+class ReviewStore:
+    """Các mảng của store (memory-mapped, chỉ đọc)"""
+
+    def __init__(self, store_dir, mmap_mode='r'):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "manifest.json"), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        for name in ARRAY_FILES:
+            setattr(self, name, np.load(os.path.join(store_dir, name + ".npy"), mmap_mode=mmap_mode))
+        self.n_users = self.manifest['n_users']
+        self.n_apps = self.manifest['n_apps']
+        self._user_matrix = None
+        self._posting_matrix = None
+
+    def __len__(self):
+        return self.manifest['n_reviews']
+
+    def signature(self):
+        """Định danh phiên bản dữ liệu, để các chỉ mục build từ store biết khi nào cần build lại"""
+        return {k: self.manifest.get(k) for k in ('version', 'n_reviews', 'source_size', 'source_mtime')}
+
+    def user_matrix(self):
+        """Ma trận thưa User x Game (CSR) dựng trực tiếp trên các mảng đã mmap"""
+        if self._user_matrix is None:
+            self._user_matrix = csr_matrix(
+                (self.is_recommended, self.app_index, self.indptr),
+                shape=(self.n_users, self.n_apps), copy=False
+            )
+        return self._user_matrix
+
+    def posting_matrix(self):
+        """Chỉ mục ngược Game x User (giá trị 1 = user đã review game)"""
+        if self._posting_matrix is None:
+            self._posting_matrix = csr_matrix(
+                (np.ones(len(self.app_users), dtype=np.int32), self.app_users, self.app_indptr),
+                shape=(self.n_apps, self.n_users), copy=False
+            )
+        return self._posting_matrix
+
+    def overlap_counts(self, app_index):
+        """
+        Số game trong app_index mà mỗi user đã review = query (1 x Game) . posting (Game x User).
+        Chỉ đụng tới posting list của các game trong query. Trả về (user_index, counts).
+        """
+        app_index = np.unique(np.asarray(app_index, dtype=np.int64))
+        query = csr_matrix(
+            (np.ones(len(app_index), dtype=np.int32), app_index, [0, len(app_index)]),
+            shape=(1, self.n_apps)
+        )
+        counts = (query @ self.posting_matrix()).tocsr()
+        counts.sum_duplicates()
+        return counts.indices, counts.data
+
+    def candidate_users(self, app_index, threshold, exclude_users=None):
+        """User (chỉ số dòng, tăng dần) đã review ít nhất `threshold` game trong app_index"""
+        users, counts = self.overlap_counts(app_index)
+        users = users[counts >= threshold]
+        if exclude_users is not None:
+            users = users[~np.isin(users, exclude_users)]
+        return np.sort(users)
+
+    def filter_by_overlap(self, users, app_index, threshold):
+        """Giữ các user (trong 1 shortlist nhỏ) đã review ít nhất `threshold` game trong app_index"""
+        users = np.asarray(users)
+        if len(users) == 0:
+            return users
+        overlap = self.user_matrix()[users][:, np.asarray(app_index)].getnnz(axis=1)
+        return users[overlap >= threshold]
+
+    def neighbour_matrix(self, users):
+        """
+        Cắt các dòng của users từ CSR toàn cục và chỉ giữ các cột game có xuất hiện.
+        Trả về (matrix, app_ids) với app_ids tăng dần.
+        """
+        matrix = self.user_matrix()[users]
+        used_columns = np.unique(matrix.indices)
+        return matrix[:, used_columns], self.app_ids[used_columns]
+
+    def app_index_of(self, app_ids):
+        """app_id gốc -> chỉ số cột (-1 nếu không có trong store)"""
+        app_ids = np.asarray(app_ids, dtype=np.int64)
+        pos = np.searchsorted(self.app_ids, app_ids)
+        pos = np.minimum(pos, max(self.n_apps - 1, 0))
+        found = (self.n_apps > 0) & (self.app_ids[pos] == app_ids)
+        return np.where(found, pos, -1)
+
+    def user_index_of(self, user_ids):
+        """user_id gốc -> chỉ số dòng (-1 nếu không có trong store)"""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        pos = np.searchsorted(self.user_ids, user_ids)
+        pos = np.minimum(pos, max(self.n_users - 1, 0))
+        found = (self.n_users > 0) & (self.user_ids[pos] == user_ids)
+        return np.where(found, pos, -1)
+
+    def to_frame(self):
+        """DataFrame cùng cột với final_reviews.csv (app_id, is_recommended, user_id) nhưng dtype gọn"""
+        return pd.DataFrame({
+            'app_id': self.app_ids[self.app_index],
+            'is_recommended': np.asarray(self.is_recommended) > 0,
+            'user_id': self.user_ids[self.user_index],
+        })
+
+
+def is_store_fresh(store_dir, csv_path):
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True  # Chỉ còn store (đã xóa CSV) -> vẫn dùng được
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        return False
+    signature = _source_signature(csv_path)
+    return all(manifest.get(k) == v for k, v in signature.items())
+
+
+def load_review_store(dir_path, mmap_mode='r'):
+    """
+    Load store trong dir_path (thư mục chứa final_reviews.csv).
+    Tự động convert 1 lần nếu store chưa có hoặc CSV đã thay đổi.
+    """
+    csv_path = os.path.join(dir_path, "final_reviews.csv")
+    store_dir = os.path.join(dir_path, STORE_DIR_NAME)
+    if not is_store_fresh(store_dir, csv_path):
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"File {csv_path} not found.")
+        build_review_store(csv_path, store_dir)
+    return ReviewStore(store_dir, mmap_mode=mmap_mode)
+
+
+if __name__ == "__main__":
+    knn_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    build_review_store(os.path.join(knn_dir, "final_reviews.csv"), os.path.join(knn_dir, STORE_DIR_NAME))
@@ -3,6 +3,7 @@ import asyncio
 import tkinter as tk
 import os
 import Data_handler
+from Game_catalog import load_game_catalog
 import UI_elements as elements
 
 if sys.platform == 'win32':
@@ -19,6 +20,7 @@ print("Loading data...")
 df_all, all_games_dict = Data_handler.load_data(all_games_path, 'all')
 df_played, played_games_dict = Data_handler.load_data(played_games_path, 'played')
 df_fav, fav_games_dict = Data_handler.load_data(fav_games_path, 'fav')
+catalog = load_game_catalog(dir_path)
 print(f"Data loaded. {len(all_games_dict)} games available.")
 
 # Create the main window
@@ -48,7 +50,7 @@ review_controls = elements.review_controls_frame(root, games_frame, played_games
 fav_controls = elements.favourite_controls_frame(root, played_games_frame, played_games_dict, fav_games_frame, fav_games_dict)
 
 # 6. System Controls (Save, Get Recs)
-sys_controls = elements.system_controls_frame(root, played_games_dict, fav_games_dict, dir_path, df_all)
+sys_controls = elements.system_controls_frame(root, played_games_dict, fav_games_dict, dir_path, catalog)
 
 # Footer
 footer_label = tk.Label(root, text='KNN Collaborative Filtering - Uses user behavior to find similar users', 
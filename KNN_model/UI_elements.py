@@ -145,12 +145,12 @@ def favourite_controls_frame(root, played_games_frame, played_games_dict, fav_ga
 
     return frame
 
-def system_controls_frame(root, played_games_dict, fav_games_dict, dir_path, df_all):
+def system_controls_frame(root, played_games_dict, fav_games_dict, dir_path, catalog):
     frame = tk.Frame(root)
     frame.pack(pady=15)
 
     btn_save = tk.Button(frame, text='Save Your Data', font=('Arial', 12, 'bold'), bg='lightblue', width=20,
-                        command=lambda: commands.confirm(played_games_dict, fav_games_dict, df_all, dir_path))
+                        command=lambda: commands.confirm(played_games_dict, fav_games_dict, catalog, dir_path))
     btn_save.grid(row=0, column=0, padx=20)
 
     btn_rec = tk.Button(frame, text='Get Recommendations', font=('Arial', 12, 'bold'), bg='lightgreen', width=20,
@@ -0,0 +1,141 @@
+"""
+User LSH Index - Chỉ mục gần đúng (ANN) cho hàng xóm KNN
+Random-hyperplane LSH (SimHash) trên vector Like/Dislike của user: 2 user có cosine gần nhau
+thì bit dấu của phép chiếu lên các siêu phẳng ngẫu nhiên gần như trùng nhau.
+- n_tables bảng băm, mỗi bảng n_bits bit -> 1 bucket
+- Truy vấn: lấy user trong bucket của query + các bucket lệch `probe_radius` bit (multi-probe)
+  -> nhiều bảng / bán kính lớn = recall cao hơn nhưng chậm hơn.
+Shortlist trả về sau đó được KNN tính lại khoảng cách cosine chính xác (rerank).
+
+Build 1 lần sau khi có review store:
+    python User_LSH.py
+"""
+
+import os
+import sys
+import json
+import time
+from itertools import combinations
+import numpy as np
+
+from Review_store import load_review_store, STORE_DIR_NAME
+
+INDEX_DIR_NAME = "user_lsh"
+INDEX_VERSION = 1
+N_TABLES = 8
+N_BITS = 16
+PROBE_RADIUS = 1
+CHUNK_SIZE = 200_000
+
+
+class UserLSHIndex:
+    def __init__(self, planes, table_codes, table_users, manifest):
+        self.planes = planes              # (n_apps, n_tables * n_bits) float32
+        self.table_codes = table_codes    # (n_tables, n_users) uint32, đã sắp xếp trong từng bảng
+        self.table_users = table_users    # (n_tables, n_users) int32, user tương ứng
+        self.manifest = manifest
+        self.n_tables = manifest['n_tables']
+        self.n_bits = manifest['n_bits']
+        self._bit_values = (np.uint32(1) << np.arange(self.n_bits, dtype=np.uint32))
+
+    @classmethod
+    def build(cls, store, n_tables=N_TABLES, n_bits=N_BITS, seed=42, chunk_size=CHUNK_SIZE):
+        """Chiếu toàn bộ user (theo từng chunk) và sắp xếp theo mã băm của từng bảng"""
+        start = time.time()
+        rng = np.random.default_rng(seed)
+        planes = rng.standard_normal((store.n_apps, n_tables * n_bits)).astype(np.float32)
+        bit_values = (np.uint32(1) << np.arange(n_bits, dtype=np.uint32))
+
+        matrix = store.user_matrix()
+        codes = np.empty((n_tables, store.n_users), dtype=np.uint32)
+        for begin in range(0, store.n_users, chunk_size):
+            end = min(begin + chunk_size, store.n_users)
+            bits = (matrix[begin:end] @ planes) > 0
+            codes[:, begin:end] = (bits.reshape(end - begin, n_tables, n_bits) * bit_values).sum(axis=2).T
+
+        table_users = np.argsort(codes, axis=1, kind='stable').astype(np.int32)
+        table_codes = np.take_along_axis(codes, table_users, axis=1)
+
+        manifest = {
+            'version': INDEX_VERSION,
+            'n_tables': n_tables,
+            'n_bits': n_bits,
+            'seed': seed,
+            'n_users': store.n_users,
+            'store_signature': store.signature(),
+        }
+        print(f"User LSH index built: {n_tables} tables x {n_bits} bits, {store.n_users} users "
+              f"({time.time() - start:.1f}s)")
+        return cls(planes, table_codes, table_users, manifest)
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "planes.npy"), self.planes)
+        np.save(os.path.join(index_dir, "table_codes.npy"), self.table_codes)
+        np.save(os.path.join(index_dir, "table_users.npy"), self.table_users)
+        with open(os.path.join(index_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir, mmap_mode='r'):
+        with open(os.path.join(index_dir, "manifest.json"), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        arrays = [np.load(os.path.join(index_dir, name + ".npy"), mmap_mode=mmap_mode)
+                  for name in ('planes', 'table_codes', 'table_users')]
+        return cls(*arrays, manifest)
+
+    def query_codes(self, app_index, values):
+        """Mã băm của vector query (app_index -> giá trị review) trên từng bảng"""
+        projection = np.asarray(values, dtype=np.float32) @ self.planes[np.asarray(app_index)]
+        bits = projection.reshape(self.n_tables, self.n_bits) > 0
+        return (bits * self._bit_values).sum(axis=1).astype(np.uint32)
+
+    def probe_masks(self, probe_radius):
+        """Các mặt nạ XOR lệch tối đa probe_radius bit so với bucket gốc"""
+        masks = [0]
+        for radius in range(1, probe_radius + 1):
+            for flipped in combinations(range(self.n_bits), radius):
+                masks.append(int(self._bit_values[list(flipped)].sum()))
+        return np.array(masks, dtype=np.uint32)
+
+    def candidates(self, app_index, values, n_tables=None, probe_radius=PROBE_RADIUS):
+        """Shortlist user (chỉ số dòng, tăng dần) rơi vào cùng bucket với query"""
+        if len(app_index) == 0:
+            return np.empty(0, dtype=np.int64)
+        n_tables = min(n_tables or self.n_tables, self.n_tables)
+        codes = self.query_codes(app_index, values)
+        masks = self.probe_masks(probe_radius)
+
+        found = []
+        for table in range(n_tables):
+            probes = np.bitwise_xor(codes[table], masks)
+            left = np.searchsorted(self.table_codes[table], probes, side='left')
+            right = np.searchsorted(self.table_codes[table], probes, side='right')
+            for lo, hi in zip(left, right):
+                if hi > lo:
+                    found.append(self.table_users[table, lo:hi])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+
+def load_user_lsh(dir_path, store=None):
+    """Load chỉ mục trong review store; build 1 lần nếu chưa có hoặc store đã đổi"""
+    if store is None:
+        store = load_review_store(dir_path)
+    index_dir = os.path.join(dir_path, STORE_DIR_NAME, INDEX_DIR_NAME)
+    manifest_path = os.path.join(index_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == INDEX_VERSION and manifest.get('store_signature') == store.signature():
+            return UserLSHIndex.load(index_dir)
+    index = UserLSHIndex.build(store)
+    index.save(index_dir)
+    return index
+
+
+if __name__ == "__main__":
+    knn_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    review_store = load_review_store(knn_dir)
+    UserLSHIndex.build(review_store).save(os.path.join(knn_dir, STORE_DIR_NAME, INDEX_DIR_NAME))
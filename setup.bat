@@ -1,8 +1,7 @@
 REM Install required packages
 echo Installing pandas...
 pip install pandas
-pip install nbformat
-pip install nbconvert
+pip install numpy
 pip install scipy
 pip install scikit-learn
 REM Wait for user input before closing
@@ -0,0 +1,57 @@
+"""
+Batch KNN cho toàn bộ user ảo (synthetic_data/user_*)
+Gom your_games.csv / fav_games.csv của mọi user thành 1 batch và chấm điểm bằng
+KNNRecommender.recommend_batch (vài phép nhân ma trận thưa thay vì N lần chạy đơn lẻ).
+Ghi rcm_games.csv / rcm_wish.csv vào thư mục của từng user.
+Thêm --compare để chạy lại bản đơn lẻ và so sánh thời gian.
+"""
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "KNN_model"))
+
+from KNN_Core import KNNRecommender, load_user_profile, MAX_K
+
+# --- CẤU HÌNH ---
+KNN_DIR = os.path.join(project_root, "KNN_model")
+SYNTHETIC_DIR = os.path.join(project_root, "synthetic_data")
+COMPARE = "--compare" in sys.argv
+
+
+def main():
+    if not os.path.exists(SYNTHETIC_DIR):
+        print(f"❌ Không tìm thấy {SYNTHETIC_DIR}. Hãy chạy generate_synthetic_users.py trước.")
+        return
+
+    user_dirs = sorted(
+        os.path.join(SYNTHETIC_DIR, name) for name in os.listdir(SYNTHETIC_DIR)
+        if name.startswith("user_") and os.path.isdir(os.path.join(SYNTHETIC_DIR, name))
+    )
+    profiles = [load_user_profile(user_dir) for user_dir in user_dirs]
+    print(f"🚀 Batch KNN cho {len(profiles)} user ảo...")
+
+    engine = KNNRecommender(KNN_DIR)
+    if not engine.load_data():
+        return
+
+    start = time.time()
+    results = engine.recommend_batch(profiles, k=MAX_K)
+    batch_time = time.time() - start
+
+    for user_dir, (recommendation, recommendation_wish) in zip(user_dirs, results):
+        engine.save_recommendations(recommendation, recommendation_wish, user_dir)
+    print(f"✅ Batch: {batch_time:.2f}s ({batch_time / max(len(profiles), 1) * 1000:.1f} ms/user)")
+
+    if COMPARE:
+        start = time.time()
+        for your_games, fav_games in profiles:
+            engine.recommend(your_games, fav_games)
+        single_time = time.time() - start
+        print(f"   Đơn lẻ: {single_time:.2f}s -> nhanh hơn {single_time / max(batch_time, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark ANN index (IVF) của Content-Based
+So sánh get_recommendations chấm điểm toàn bộ catalog với ANN index (k-means ~4*sqrt(N) cụm)
+ở nhiều n_probe: latency mỗi query và recall@k (tỉ lệ top-k của cách chính xác được ANN tìm lại).
+Dùng cùng dữ liệu ngẫu nhiên với benchmark_cb_similarity.py.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "CB_model"))
+
+from benchmark_cb_similarity import make_data, make_model
+
+# --- CẤU HÌNH ---
+CATALOG_SIZES = [100_000, 1_000_000]
+PROBE_FRACTIONS = [0.01, 0.02, 0.05, 0.1]   # n_probe = tỉ lệ số cụm được xét
+NUM_QUERIES = 20
+LIKED_PER_QUERY = 5
+TOP_K = 200
+SMALL_CATALOG = 10                          # Kiểm tra catalog nhỏ hơn số cụm yêu cầu
+SMALL_LISTS = [50, 'auto']
+
+
+def run_queries(model, catalog, queries):
+    """Trả về (thời gian trung bình mỗi query, danh sách tập AppID top-k)"""
+    results = []
+    start = time.perf_counter()
+    for rated_games in queries:
+        recs = model.get_recommendations(catalog, rated_games, None, TOP_K)
+        results.append(set(recs['AppID'].tolist()))
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def check_small_catalog(rng):
+    """Catalog ít game hơn số cụm (ann_lists) vẫn build được index và trả đủ game như cách chính xác"""
+    features, catalog = make_data(SMALL_CATALOG, rng)
+    features = features[:1] + rng.normal(scale=0.3, size=features.shape)   # cùng 1 cụm -> đủ game qua ngưỡng similarity
+    rated_games = {int(catalog.app_ids[0]): 5}
+    model = make_model(features, catalog.app_ids, quantized=False)
+    expected = set(model.get_recommendations(catalog, rated_games, None, TOP_K)['AppID'].tolist())
+    for n_lists in SMALL_LISTS:
+        index = model.build_ann_index(None if n_lists == 'auto' else n_lists)
+        index.n_probe = index.n_lists
+        found = set(model.get_recommendations(catalog, rated_games, None, TOP_K)['AppID'].tolist())
+        status = "OK" if index.n_lists <= SMALL_CATALOG and len(expected) > 1 and found == expected else "FAILED"
+        print(f"Small catalog: {SMALL_CATALOG} games, ann_lists={n_lists} -> {index.n_lists} lists | {status}")
+    model.ann_index = None
+
+
+def main():
+    rng = np.random.default_rng(7)
+    check_small_catalog(rng)
+    print("=" * 80)
+    print(f"BENCHMARK CB ANN INDEX (IVF, top {TOP_K}, {NUM_QUERIES} queries)")
+    print("=" * 80)
+
+    for num_games in CATALOG_SIZES:
+        features, catalog = make_data(num_games, rng)
+        queries = [
+            {int(catalog.app_ids[i]): 5 for i in rng.choice(num_games, LIKED_PER_QUERY, replace=False)}
+            for _ in range(NUM_QUERIES)
+        ]
+
+        exact = make_model(features, catalog.app_ids, quantized=False)
+        exact.get_recommendations(catalog, queries[0], None, TOP_K)  # căn catalog 1 lần
+        exact_time, expected = run_queries(exact, catalog, queries)
+
+        start = time.perf_counter()
+        index = exact.build_ann_index()
+        build_time = time.perf_counter() - start
+
+        print(f"{num_games:,} games | {index.n_lists} lists | build {build_time:.1f}s")
+        print(f"{'n_probe':>8} | {'Scanned':>8} | {'ms / query':>10} | {'Speedup':>8} | Recall@{TOP_K}")
+        print("-" * 80)
+        print(f"{'exact':>8} | {'100.0%':>8} | {exact_time * 1000:>10.2f} | {'1.0x':>8} | 100.00%")
+
+        for fraction in PROBE_FRACTIONS:
+            index.n_probe = max(1, int(index.n_lists * fraction))
+            ann_time, found = run_queries(exact, catalog, queries)
+            recall = [len(a & b) / max(len(a), 1) for a, b in zip(expected, found)]
+            print(f"{index.n_probe:>8} | {fraction:>8.1%} | {ann_time * 1000:>10.2f} | {exact_time / ann_time:>7.1f}x | "
+                  f"{np.mean(recall):.2%} (min {np.min(recall):.2%})")
+        exact.ann_index = None
+        print("-" * 80)
+
+    print("Scanned: tỉ lệ cụm được xét (xấp xỉ tỉ lệ game được chấm điểm chính xác).")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark chấm điểm Content-Based
+So sánh cách cũ (sklearn cosine_similarity trên ma trận SVD float64, chuẩn hóa lại mỗi lần)
+với game_features float32 đã chuẩn hóa L2 (1 phép GEMV) và bản int8 + chấm lại shortlist,
+ở 100k / 1M game (embedding ngẫu nhiên 100 chiều). Báo cáo latency, bộ nhớ và độ trùng top-k.
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import cosine_similarity
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "CB_model"))
+
+from ContentBased_model import ContentBasedRecommender, _top_candidates
+from Game_catalog import GameCatalog
+
+# --- CẤU HÌNH ---
+CATALOG_SIZES = [100_000, 1_000_000]
+DIMENSIONS = 100
+NUM_CLUSTERS = 200
+NUM_QUERIES = 20
+LIKED_PER_QUERY = 5
+TOP_K = 200
+
+
+def make_data(num_games, rng):
+    """Embedding theo cụm (giống game cùng thể loại) + catalog giá / review ngẫu nhiên"""
+    centers = rng.normal(size=(NUM_CLUSTERS, DIMENSIONS))
+    features = centers[rng.integers(0, NUM_CLUSTERS, num_games)] + rng.normal(scale=0.8, size=(num_games, DIMENSIONS))
+    features *= rng.lognormal(sigma=0.5, size=(num_games, 1))
+    df = pd.DataFrame({
+        'Name': [f"Game {i}" for i in range(num_games)],
+        'Price': rng.choice([0.0, 4.99, 9.99, 19.99, 59.99], num_games),
+        'Positive': rng.integers(0, 50_000, num_games),
+        'Negative': rng.integers(0, 5_000, num_games),
+    }, index=pd.Index(np.arange(10, num_games + 10), name='AppID'))
+    return features, GameCatalog.from_cb_games(df)
+
+
+def make_model(features, app_ids, quantized):
+    model = ContentBasedRecommender(quantized=quantized)
+    model._set_features(features)
+    model._set_game_indices(app_ids.tolist())
+    model.is_trained = True
+    return model
+
+
+def legacy_top_k(features, indices, weights, k):
+    """Đường cũ: cosine_similarity(profile, ma trận float64) rồi chọn top-k (bỏ game đã thích)"""
+    profile = np.average(features[indices], axis=0, weights=weights).reshape(1, -1)
+    similarities = cosine_similarity(profile, features).flatten()
+    eligible = similarities >= 0.1
+    eligible[indices] = False
+    return _top_candidates(np.flatnonzero(eligible), similarities, k)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print("=" * 92)
+    print(f"BENCHMARK CONTENT-BASED SCORING ({DIMENSIONS}-d, top {TOP_K}, {NUM_QUERIES} queries)")
+    print("=" * 92)
+    print(f"{'Games':>10} | {'Path':<16} | {'Features (MB)':>13} | {'ms / query':>10} | {'Speedup':>8} | Top-k agreement")
+    print("-" * 92)
+
+    for num_games in CATALOG_SIZES:
+        features, catalog = make_data(num_games, rng)
+        models = {
+            'float32 GEMV': make_model(features, catalog.app_ids, quantized=False),
+            'int8 + rescore': make_model(features, catalog.app_ids, quantized=True),
+        }
+        queries = [
+            (rng.choice(num_games, LIKED_PER_QUERY, replace=False), rng.integers(3, 6, LIKED_PER_QUERY))
+            for _ in range(NUM_QUERIES)
+        ]
+
+        legacy_time = 0.0
+        expected = []
+        for indices, weights in queries:
+            top, seconds = timed(legacy_top_k, features, indices, weights - 2, TOP_K)
+            legacy_time += seconds
+            expected.append(set(catalog.app_ids[top].tolist()))
+        print(f"{num_games:>10,} | {'legacy float64':<16} | {features.nbytes / 1e6:>13.1f} | "
+              f"{legacy_time / NUM_QUERIES * 1000:>10.2f} | {'1.0x':>8} | -")
+
+        for name, model in models.items():
+            model.get_recommendations(catalog, {int(catalog.app_ids[0]): 5}, top_n=TOP_K)  # căn catalog 1 lần
+            total_time = 0.0
+            agreement = []
+            for (indices, ratings), reference in zip(queries, expected):
+                rated_games = {int(catalog.app_ids[i]): int(r) for i, r in zip(indices, ratings)}
+                recs, seconds = timed(model.get_recommendations, catalog, rated_games, None, TOP_K)
+                total_time += seconds
+                agreement.append(len(reference & set(recs['AppID'].tolist())) / max(len(reference), 1))
+
+            memory = model.game_features.nbytes if model.quantized_features is None else model.quantized_features.nbytes
+            print(f"{num_games:>10,} | {name:<16} | {memory / 1e6:>13.1f} | {total_time / NUM_QUERIES * 1000:>10.2f} | "
+                  f"{legacy_time / total_time:>7.1f}x | {np.mean(agreement):.2%} (min {np.min(agreement):.2%})")
+        print("-" * 92)
+
+    print("Latency của float32 / int8 tính cả bước lọc + rescoring (get_recommendations đầy đủ).")
+    print("=" * 92)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark chọn Top-k hàng xóm trong KNN
+So sánh cách cũ của notebook (list tuple (i, distance, dòng thưa) + sorted toàn bộ)
+với nearest_neighbours (np.argpartition + 1 lần fancy-index) ở 10k / 100k / 1M user ứng viên.
+"""
+import os
+import sys
+import time
+import numpy as np
+from scipy.sparse import random as sparse_random
+from sklearn.metrics.pairwise import cosine_distances
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "KNN_model"))
+
+from KNN_Core import nearest_neighbours
+
+# --- CẤU HÌNH ---
+CANDIDATE_SIZES = [10_000, 100_000, 1_000_000]
+NUM_GAMES = 5_000
+REVIEWS_PER_USER = 20
+K = 1000
+EPSILON = 1e-9
+
+
+def legacy_knn_vector(user_vector_sparse, my_vector, weights, k):
+    """getDistanceList + getKnnVector bản cũ trong knn_model.ipynb"""
+    distances = cosine_distances(user_vector_sparse, my_vector).flatten()
+    distance_list = [(i, distances[i], user_vector_sparse[i]) for i in range(user_vector_sparse.shape[0])]
+    distance_list = sorted(distance_list, key=lambda x: x[1])
+
+    k = min(k, len(distance_list))
+    indices = np.array([distance_list[i][0] for i in range(k)])
+    dists = np.array([distance_list[i][1] for i in range(k)])
+    weighted = user_vector_sparse[indices].multiply((weights[indices] / (dists + EPSILON))[:, None])
+    return np.asarray(weighted.sum(axis=0)).ravel()
+
+
+def topk_knn_vector(user_vector_sparse, my_vector, weights, k):
+    distances = cosine_distances(user_vector_sparse, my_vector).flatten()
+    indices = nearest_neighbours(distances, k)
+    weighted = user_vector_sparse[indices].multiply((weights[indices] / (distances[indices] + EPSILON))[:, None])
+    return np.asarray(weighted.sum(axis=0)).ravel()
+
+
+def make_data(num_users, rng):
+    matrix = sparse_random(num_users, NUM_GAMES, density=REVIEWS_PER_USER / NUM_GAMES,
+                           format='csr', random_state=rng, data_rvs=lambda n: rng.choice([-1.0, 1.0], n))
+    my_vector = sparse_random(1, NUM_GAMES, density=REVIEWS_PER_USER / NUM_GAMES,
+                              format='csr', random_state=rng, data_rvs=lambda n: rng.choice([-1.0, 1.0], n))
+    weights = rng.random(num_users) + 0.5
+    return matrix, my_vector, weights
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print("=" * 70)
+    print(f"BENCHMARK TOP-K NEIGHBOUR SELECTION (k={K}, {NUM_GAMES} games)")
+    print("=" * 70)
+    print(f"{'Candidates':>12} | {'Legacy (s)':>12} | {'Top-k (s)':>12} | {'Speedup':>8} | Same result")
+    print("-" * 70)
+
+    for num_users in CANDIDATE_SIZES:
+        matrix, my_vector, weights = make_data(num_users, rng)
+
+        start = time.perf_counter()
+        legacy = legacy_knn_vector(matrix, my_vector, weights, K)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = topk_knn_vector(matrix, my_vector, weights, K)
+        fast_time = time.perf_counter() - start
+
+        same = np.allclose(legacy, fast)
+        print(f"{num_users:>12,} | {legacy_time:>12.3f} | {fast_time:>12.3f} | {legacy_time / fast_time:>7.1f}x | {same}")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,10 @@ import json
 import os
 import random
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "KNN_model"))
+from Review_store import load_review_store
 
 # --- CẤU HÌNH ---
 NUM_USERS = 50
@@ -38,19 +42,19 @@ def load_popular_games():
     games_path = os.path.join(KNN_DIR, "final_games.csv")
     reviews_path = os.path.join(KNN_DIR, "final_reviews.csv")
     
-    if not os.path.exists(games_path) or not os.path.exists(reviews_path):
+    store_path = os.path.join(KNN_DIR, "final_reviews_store")
+    if not os.path.exists(games_path) or not (os.path.exists(reviews_path) or os.path.exists(store_path)):
         print(f"❌ Thiếu file data trong {KNN_DIR}")
         return pd.DataFrame()
     
     print("Đang đọc dữ liệu game và reviews để lọc game phổ biến...")
     df_games = pd.read_csv(games_path)
     
-    # Đọc review để đếm số lượng người chơi cho mỗi game
-    # Chỉ đọc 2 cột cần thiết cho nhẹ
-    df_reviews = pd.read_csv(reviews_path, usecols=['app_id'])
-    
-    # Đếm số review cho mỗi app_id
-    game_counts = df_reviews['app_id'].value_counts()
+    # Đếm số review cho mỗi app_id trực tiếp trên store (mmap, không parse CSV)
+    store = load_review_store(KNN_DIR)
+    game_counts = pd.Series(
+        np.bincount(store.app_index, minlength=store.n_apps), index=store.app_ids
+    ).sort_values(ascending=False, kind='stable')
     
     # Chỉ lấy Top 1000 game phổ biến nhất để tạo user ảo
     # Điều này đảm bảo khi chạy KNN sẽ luôn tìm thấy người chơi cùng
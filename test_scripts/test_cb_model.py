@@ -19,7 +19,7 @@ sys.path.append(cb_model_path)
 # --- 2. IMPORT MODULE TỪ CB_MODEL ---
 try:
     from ContentBased_model import ContentBasedRecommender
-    from ContentBased_data_handler import load_games_csv
+    from ContentBased_data_handler import load_games_catalog, clean_currency, clean_number, clean_currency_column, clean_number_column
 except ImportError as e:
     print(f"Lỗi Import: {e}")
     print(f"Đường dẫn đang thử: {cb_model_path}")
@@ -32,6 +32,10 @@ DATA_PATH = os.path.join(cb_model_path, "CB_games.csv")
 TEST_RATIO = 0.2            # Lấy 20% dataset để test
 TOP_K = 10                  # Số lượng game recommend mỗi lần test
 
+# Giá trị thô kiểu CB_games.csv để so bản làm sạch vector hóa với bản cũ (từng giá trị)
+CLEANING_CASES = ['1e3', '1E2', 'nan', 'NaN', 'inf', '-inf', ' 12 ', ' 7\t', '$ 1,299.99 ', '$0.99', 'Free', 'Free to Play',
+                  None, np.nan, '12.7', '1,234', '', '   ', '-5', '+3', '-0', '1_000', 'abc', '0x10', '1.2.3', 12.5, 3, True]
+
 def calculate_jaccard_similarity(str1, str2):
     """Tính độ tương đồng tập hợp giữa 2 chuỗi tags/genres"""
     set1 = set([x.strip().lower() for x in str(str1).split(',') if x.strip()])
@@ -44,6 +48,24 @@ def calculate_jaccard_similarity(str1, str2):
     union = len(set1.union(set2))
     return intersection / union
 
+def check_cleaning_parity():
+    """clean_currency_column / clean_number_column phải cho kết quả giống clean_currency / clean_number"""
+    values = pd.Series(CLEANING_CASES, dtype=object)
+    checks = [
+        ("Price", clean_currency_column, clean_currency),
+        ("Positive/Negative", clean_number_column, clean_number),
+    ]
+    passed = True
+    for name, column_func, scalar_func in checks:
+        expected = values.map(scalar_func).tolist()
+        actual = column_func(values).tolist()
+        for raw, a, b in zip(CLEANING_CASES, actual, expected):
+            if not (a == b or (pd.isna(a) and pd.isna(b))):
+                print(f"[!] {name}: {raw!r} -> {a!r} (bản cũ: {b!r})")
+                passed = False
+    print(f"[0] Cleaning parity ({len(CLEANING_CASES)} giá trị): {'OK' if passed else 'FAILED'}")
+    return passed
+
 def evaluate_model():
     print("-" * 50)
     print("BẮT ĐẦU QUÁ TRÌNH KIỂM THỬ MODEL (EVALUATION)")
@@ -51,7 +73,8 @@ def evaluate_model():
 
     # 1. Load Data
     print(f"[1] Loading Data from: {DATA_PATH}...")
-    df = load_games_csv(DATA_PATH)
+    catalog = load_games_catalog(DATA_PATH)  # Dựng hash map / mảng 1 lần cho mọi lượt test
+    df = catalog.frame if catalog is not None else None
     if df is None or df.empty:
         print("Lỗi: Không tìm thấy dữ liệu hoặc file rỗng.")
         return
@@ -65,6 +88,9 @@ def evaluate_model():
         print("Lỗi: Train thất bại.")
         return
 
+    # Mỗi lượt test là profile 1 game -> đọc ứng viên từ bảng neighbour thay vì chấm toàn bộ catalog
+    recommender.build_neighbour_table()
+
     # 3. Tạo Test Set (Lấy ngẫu nhiên 20%)
     num_test = int(len(df) * TEST_RATIO)
     test_indices = random.sample(list(df.index), num_test)
@@ -101,7 +127,7 @@ def evaluate_model():
         
         # Lấy Recommendations
         try:
-            recs = recommender.get_recommendations(df, rated_games, user_preferences=None, top_n=TOP_K)
+            recs = recommender.get_recommendations(catalog, rated_games, user_preferences=None, top_n=TOP_K)
         except Exception:
             continue
         
@@ -179,4 +205,5 @@ def evaluate_model():
         print(f"\n[!] Lỗi không lưu được file: {e}")
 
 if __name__ == "__main__":
+    check_cleaning_parity()
     evaluate_model()
\ No newline at end of file
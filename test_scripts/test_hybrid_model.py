@@ -12,7 +12,7 @@ hybrid_model_path = os.path.join(project_root, "Hybrid_model")
 sys.path.append(hybrid_model_path)
 
 try:
-    from Hybrid_recommendations_reader import calculate_hybrid_ranking
+    from Hybrid_recommendations_reader import sweep_hybrid_ranking
 except ImportError as e:
     print(f"Lỗi Import: {e}")
     print(f"Đường dẫn đã thử: {hybrid_model_path}")
@@ -84,23 +84,17 @@ def test_weight_sensitivity(knn_dir, cb_dir):
         {'name': 'Thiên về Nội dung (CB)',   'w_knn': 0.2, 'w_cb': 0.8}
     ]
     
+    # Đọc + ghép 2 file 1 lần, tính mọi kịch bản trong 1 lượt (broadcast numpy)
+    grid = pd.DataFrame({
+        'knn_weight': [sc['w_knn'] for sc in scenarios],
+        'cb_weight': [sc['w_cb'] for sc in scenarios]
+    }, index=[sc['name'] for sc in scenarios])
     results = {}
-    
-    # Tắt output của hàm calculate_hybrid_ranking để báo cáo sạch đẹp
-    original_stdout = sys.stdout
-    sys.stdout = open(os.devnull, 'w')
-    
     try:
-        for sc in scenarios:
-            df_hybrid = calculate_hybrid_ranking(
-                knn_dir, cb_dir, top_n=10, 
-                knn_weight=sc['w_knn'], cb_weight=sc['w_cb']
-            )
-            results[sc['name']] = df_hybrid
-    except Exception:
-        pass
-    finally:
-        sys.stdout = original_stdout # Khôi phục in ra màn hình
+        sweep = sweep_hybrid_ranking(knn_dir, cb_dir, grid, top_n=10)
+        results = {name: df.drop(columns='Scenario') for name, df in sweep.groupby('Scenario', sort=False)}
+    except Exception as e:
+        log(f"Lỗi khi chạy weight sweep: {e}")
 
     # In kết quả sau khi đã tính xong
     for sc in scenarios:
@@ -112,7 +106,7 @@ def test_weight_sensitivity(knn_dir, cb_dir):
             log(f"   Top 3 Games: {top_3}")
             
             # Đếm overlap trong top 10
-            overlap_count = len(df[ (df['Knn Score'] > 0) & (df['Cb Score'] > 0) ])
+            overlap_count = int(((df['Knn Score'] > 0) & (df['Cb Score'] > 0)).sum())
             log(f"   Số game đồng thuận trong Top 10: {overlap_count}")
         else:
             log("   Không tạo được danh sách.")
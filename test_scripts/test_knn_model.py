@@ -4,37 +4,53 @@ from scipy.sparse import csr_matrix
 from sklearn.metrics.pairwise import cosine_distances
 import random
 import os
+import sys
 import time
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 
 # --- CẤU HÌNH ---
 DATA_FILE = "final_reviews.csv"
-TEST_USER_COUNT = 50    # Số lượng user để test
+# Số lượng user để test (python test_knn_model.py --users 1000 : chạy đánh giá lớn hơn)
+TEST_USER_COUNT = int(sys.argv[sys.argv.index("--users") + 1]) if "--users" in sys.argv else 50
 MIN_REVIEWS = 50        # Số review tối thiểu để được chọn
 TOP_K = 10              # Số lượng game gợi ý
 MATCH_PERCENTAGE = 0.5  # Ngưỡng lọc hàng xóm (Giữ 0.3-0.5 để có kết quả tốt)
+USE_ANN = "--ann" in sys.argv  # python test_knn_model.py --ann : chọn hàng xóm bằng LSH (gần đúng)
+SEED = 42               # Seed cố định: cùng danh sách user + cùng cách chia 80/20 dù chạy bao nhiêu process
+N_WORKERS = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else (os.cpu_count() or 1)
 
 def get_project_root():
     """Lấy đường dẫn thư mục gốc dự án"""
     current_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.dirname(current_dir)
 
+# Import Review Store từ KNN_model
+sys.path.append(os.path.join(get_project_root(), "KNN_model"))
+from Review_store import load_review_store
+from User_LSH import load_user_lsh
+from Evaluation_metrics import ids_to_mask, confusion_counts, confusion_scores
+
 def load_data():
     project_root = get_project_root()
-    file_path = os.path.join(project_root, "KNN_model", DATA_FILE)
+    knn_dir = os.path.join(project_root, "KNN_model")
     
-    print(f"[1] Loading data from: {file_path}")
+    print(f"[1] Loading data from: {os.path.join(knn_dir, DATA_FILE)} (binary store)")
     try:
-        df = pd.read_csv(file_path)
-        # Chuyển đổi True/False sang 1/-1
-        if 'is_recommended' in df.columns:
-            df['is_recommended'] = df['is_recommended'].map({True: 1, False: -1})
-        return df
+        return load_review_store(knn_dir)
     except Exception as e:
         print(f"Lỗi: {e}")
         return None
     
-def run_test_for_single_user(target_user_id, user_history_df, full_df):
+def get_user_history(store, user_index):
+    """Lịch sử review của 1 user = 1 lát cắt CSR của store (không quét lại cả bảng)"""
+    begin, end = store.indptr[user_index], store.indptr[user_index + 1]
+    return pd.DataFrame({
+        'app_id': store.app_ids[store.app_index[begin:end]],
+        'is_recommended': np.asarray(store.is_recommended[begin:end]),
+    })
+
+def run_test_for_single_user(target_user_id, user_history_df, store, ann_index=None, rng=random):
     """Chạy thuật toán KNN cho 1 user cụ thể"""
     liked_games = user_history_df[user_history_df['is_recommended'] == 1]
     
@@ -42,7 +58,7 @@ def run_test_for_single_user(target_user_id, user_history_df, full_df):
     
     # Shuffle và chia 80/20
     liked_games_list = liked_games['app_id'].tolist()
-    random.shuffle(liked_games_list)
+    rng.shuffle(liked_games_list)
     
     split_point = int(len(liked_games_list) * 0.8)
     train_game_ids = set(liked_games_list[:split_point]) 
@@ -50,35 +66,27 @@ def run_test_for_single_user(target_user_id, user_history_df, full_df):
     
     if not test_game_ids: return 0, 0
 
-    # Tìm Hàng xóm
+    # Tìm Hàng xóm (tra chỉ mục ngược app -> users, bỏ chính user đang test)
     threshold = max(1, int(len(train_game_ids) * MATCH_PERCENTAGE))
     
-    potential_neighbors = full_df[
-        (full_df['app_id'].isin(train_game_ids)) & 
-        (full_df['user_id'] != target_user_id)
-    ]
-    
-    user_counts = potential_neighbors.groupby('user_id')['app_id'].size()
-    relevant_users_idx = user_counts[user_counts >= threshold].index
+    train_app_index = store.app_index_of(list(train_game_ids))
+    train_app_index = train_app_index[train_app_index >= 0]
+    target_index = store.user_index_of([target_user_id])
+    if ann_index is not None:
+        # Shortlist LSH -> áp ngưỡng trùng game -> tính cosine chính xác bên dưới
+        shortlist = ann_index.candidates(train_app_index, np.ones(len(train_app_index)))
+        shortlist = shortlist[~np.isin(shortlist, target_index)]
+        relevant_users_idx = store.filter_by_overlap(shortlist, train_app_index, threshold)
+    else:
+        relevant_users_idx = store.candidate_users(train_app_index, threshold, exclude_users=target_index)
     
     if len(relevant_users_idx) == 0:
         return 0, 0 
         
-    neighbor_reviews = full_df[full_df['user_id'].isin(relevant_users_idx)]
-    
-    # Tạo Matrix
-    user_list = sorted(neighbor_reviews['user_id'].unique())
-    game_list = sorted(neighbor_reviews['app_id'].unique())
-    
-    user_map = {u: i for i, u in enumerate(user_list)}
+    # Tạo Matrix (cắt dòng từ CSR toàn cục)
+    sparse_matrix, game_list = store.neighbour_matrix(relevant_users_idx)
     game_map = {g: i for i, g in enumerate(game_list)}
     
-    row_ind = [user_map[u] for u in neighbor_reviews['user_id']]
-    col_ind = [game_map[g] for g in neighbor_reviews['app_id']]
-    data = neighbor_reviews['is_recommended'].values
-    
-    sparse_matrix = csr_matrix((data, (row_ind, col_ind)), shape=(len(user_list), len(game_list)))
-    
     # Tạo Vector User
     my_vector_dict = {}
     for gid in train_game_ids:
@@ -113,35 +121,61 @@ def run_test_for_single_user(target_user_id, user_history_df, full_df):
         count += 1
         if count >= TOP_K: break
         
-    # Đánh giá
-    hits = 0
-    for rec_id in recommendations:
-        if rec_id in test_game_ids:
-            hits += 1
-            
-    precision = (hits / len(recommendations)) * 100 if recommendations else 0
-    recall = (hits / len(test_game_ids)) * 100 if test_game_ids else 0
+    # Đánh giá (mask trên không gian: game gợi ý + game bị ẩn)
+    game_space = list(set(recommendations) | test_game_ids)
+    recommended = ids_to_mask([recommendations], game_space)
+    actual = ids_to_mask([test_game_ids], game_space)
+    counts = confusion_counts(recommended, actual, unknown_as_negative=True)
+    _, precision, recall = confusion_scores(counts, empty=0)
     
-    return precision, recall
+    return float(precision[0]), float(recall[0])
+
+# --- PROCESS POOL ---
+# Mỗi process mở lại store bằng memory-map: các mảng CSR nằm trong page cache của OS
+# nên mọi process đọc chung 1 bản (shared memory), không pickle/copy dữ liệu review.
+_worker_store = None
+_worker_ann_index = None
+
+def _init_worker(knn_dir, use_ann):
+    global _worker_store, _worker_ann_index
+    _worker_store = load_review_store(knn_dir)
+    _worker_ann_index = load_user_lsh(knn_dir, _worker_store) if use_ann else None
+
+def _evaluate_user(args):
+    """Đánh giá 1 user trong process con. Trả về (uid, precision, recall, latency giây)"""
+    uid, user_index = args
+    start = time.perf_counter()
+    rng = random.Random(SEED * 1_000_003 + int(uid))  # Seed theo user -> không phụ thuộc thứ tự chạy
+    user_history = get_user_history(_worker_store, user_index)
+    prec, rec = run_test_for_single_user(uid, user_history, _worker_store, _worker_ann_index, rng)
+    return uid, prec, rec, time.perf_counter() - start
 
 def evaluate_model():
     print("-" * 50)
     print("BẮT ĐẦU KIỂM THỬ KNN MODEL (Collaborative Filtering)")
     print("-" * 50)
     
-    df = load_data()
-    if df is None: return
+    store = load_data()
+    if store is None: return
+    knn_dir = os.path.join(get_project_root(), "KNN_model")
+    if USE_ANN:
+        load_user_lsh(knn_dir, store)  # Build 1 lần trước khi chia cho các process
+    print(f"    -> Chế độ tìm hàng xóm: {'ANN (LSH + rerank chính xác)' if USE_ANN else 'Exact'}")
 
     print(f"[2] Đang lọc danh sách User tiềm năng (> {MIN_REVIEWS} reviews)...")
-    user_counts = df['user_id'].value_counts()
-    valid_users = user_counts[user_counts >= MIN_REVIEWS].index.tolist()
+    # Số review của mỗi user đọc thẳng từ indptr của CSR (store đã gom review theo user)
+    user_counts = np.diff(store.indptr)
+    valid_index = np.flatnonzero(user_counts >= MIN_REVIEWS)
+    valid_users = store.user_ids[valid_index].tolist()
     
     print(f"    -> Tìm thấy {len(valid_users)} user đủ điều kiện.")
     
-    # Chọn ngẫu nhiên
+    # Chọn ngẫu nhiên (seed cố định)
     actual_test_count = min(TEST_USER_COUNT, len(valid_users))
-    test_users = random.sample(valid_users, actual_test_count)
-    print(f"[3] Đã chọn ngẫu nhiên {actual_test_count} user để chạy test sâu.")
+    picked = random.Random(SEED).sample(range(len(valid_users)), actual_test_count)
+    test_users = [valid_users[i] for i in picked]
+    tasks = [(valid_users[i], int(valid_index[i])) for i in picked]
+    print(f"[3] Đã chọn ngẫu nhiên {actual_test_count} user để chạy test sâu ({N_WORKERS} process).")
     print("-" * 50)
     
     total_precision = 0
@@ -150,12 +184,20 @@ def evaluate_model():
     
     # Danh sách để lưu kết quả xuất file
     export_data = []
+    latencies = []
     
     start_time = time.time()
     
-    for i, uid in enumerate(test_users):
-        user_history = df[df['user_id'] == uid]
-        prec, rec = run_test_for_single_user(uid, user_history, df)
+    if N_WORKERS > 1:
+        pool = ProcessPoolExecutor(max_workers=N_WORKERS, initializer=_init_worker, initargs=(knn_dir, USE_ANN))
+        results = pool.map(_evaluate_user, tasks, chunksize=max(1, len(tasks) // (N_WORKERS * 8)))
+    else:
+        pool = None
+        _init_worker(knn_dir, USE_ANN)
+        results = map(_evaluate_user, tasks)
+    
+    for i, (uid, prec, rec, latency) in enumerate(results):
+        latencies.append(latency)
         
         status = "No Match"
         if prec > 0 or rec > 0:
@@ -175,6 +217,9 @@ def evaluate_model():
             "Status": status,
             "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         })
+    if pool is not None:
+        pool.shutdown()
+    wall_time = time.time() - start_time
 
     # Tính toán kết quả trung bình
     avg_precision = total_precision / successful_tests if successful_tests > 0 else 0
@@ -184,7 +229,11 @@ def evaluate_model():
     print("\n" + "=" * 50)
     print("KẾT QUẢ ĐÁNH GIÁ KNN (EVALUATION REPORT)")
     print("=" * 50)
-    print(f"Thời gian chạy: {time.time() - start_time:.2f} giây")
+    print(f"Thời gian chạy: {wall_time:.2f} giây ({N_WORKERS} process)")
+    if latencies:
+        p50, p90, p99 = np.percentile(np.array(latencies) * 1000, [50, 90, 99])
+        print(f"Latency mỗi user: p50={p50:.1f}ms, p90={p90:.1f}ms, p99={p99:.1f}ms, max={max(latencies) * 1000:.1f}ms")
+    print(f"Chế độ hàng xóm: {'ANN (LSH)' if USE_ANN else 'Exact'}")
     print(f"Số user được test: {len(test_users)}")
     print(f"Số user tìm được gợi ý: {successful_tests}")
     print("-" * 50)